@@ -1,42 +1,132 @@
 """background tasks"""
 import asyncio
-from typing import List, Optional, Union
-
-import aiohttp
-from disnake import Embed, Guild, Message, TextChannel, Thread, User
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from disnake import (
+    Embed,
+    Emoji,
+    Guild,
+    HTTPException,
+    MessageInteraction,
+    NotFound,
+    TextChannel,
+    Thread,
+    User,
+)
 from disnake.abc import GuildChannel, PrivateChannel
 from disnake.ext import tasks
 from disnake.ext.commands import Bot, Cog
 
-from helpers.db import Database, GuildData, PlayerData, db
+from helpers.alert_queue import Alert, AlertQueue, parse_alert_custom_id
+from helpers.cache import TTLCache
+from helpers.channel_cache import alert_channels
+from helpers.db import LEADERBOARD_WINDOW, Database, GuildData, db
 from helpers.helpers import DiscordReturn
-from helpers.valorant_classes import Match, Player
-from views.views import PageView, SelectEmbed
-
-session = aiohttp.ClientSession()
+from helpers.scheduler import watch_scheduler
+from helpers.sharding import watch_shards
+from helpers.valorant_assets import agent_emojis, assets
+from helpers.valorant_classes import (
+    Match,
+    Player,
+    get_saved_match,
+    match_cache,
+    roster,
+)
+
+WATCH_WORKERS: int = int(os.environ.get("WATCH_WORKERS", 5))
+# the stored matches probed by `Player.has_new_match` can lag behind the
+# match history, so the history is fetched anyway after this many probes
+# in a row found no new match
+PROBE_FULL_FETCH_EVERY: int = 5
+
+fetched_users: TTLCache[int, User] = TTLCache(ttl=60 * 60, maxsize=4096)
+"""users fetched from the api because they were not in the gateway cache"""
+missing_users: TTLCache[int, float] = TTLCache(ttl=60 * 60 * 24, maxsize=4096)
+"""unix timestamp of when each user was found to no longer exist, until they
+are deactivated by `Background.valorant_cleanup_cycle`"""
+
+
+async def fetch_user(bot: Bot, discord_id: int) -> Optional[User]:
+    """fetches a user that is not in the gateway cache from the api
+
+    users that do not exist are added to `missing_users`. other errors are
+    not cached, the user is fetched again next time
 
+    parameters
+    ----------
+    bot: disnake.ext.commands.Bot
+        bot instance
+    discord_id: int
+        discord id of the user to fetch
 
-async def check_user_exists(bot: Bot, discord_id: int) -> bool:
-    """checks if user is accessible to the bot and
-    if user has data in the database
+    returns
+    -------
+    Optional[disnake.User]
+        the user if found, None otherwise
+    """
+    try:
+        user: User = await bot.fetch_user(discord_id)
+    except NotFound:
+        missing_users.set(discord_id, time.time())
+        return None
+    except HTTPException as err:
+        print(f"error fetching user {discord_id}: ", err)
+        return None
+    fetched_users.set(discord_id, user)
+    return user
+
+
+async def resolve_users(
+    bot: Bot, discord_ids: Sequence[int], concurrency: int = WATCH_WORKERS
+) -> Dict[int, User]:
+    """resolves the users that are accessible to the bot and in the roster
+
+    users are looked up in the roster and the gateway cache first. only the
+    users missing from the gateway cache are fetched from the api, at most
+    `concurrency` at a time, and users known not to exist are skipped
+    without a request
 
     parameters
     ----------
     bot: disnake.ext.commands.Bot
         bot instance
-    discord_id: int
-        discord id of the user to check
+    discord_ids: Sequence[int]
+        discord ids of the users to resolve
+    concurrency: int
+        maximum number of users fetched from the api at the same time
 
     returns
     -------
-    bool
-        True if user is accessible and has data in the database
+    Dict[int, disnake.User]
+        user by discord id, for the users that exist and are in the roster
     """
-    if await bot.getch_user(discord_id) is None:
-        return False
-    if len(await db.get_player_data(discord_id)) == 0:
-        return False
-    return True
+    users: Dict[int, User] = {}
+    uncached: List[int] = []
+    for discord_id in discord_ids:
+        if roster.get(discord_id) is None or discord_id in missing_users:
+            continue
+        user: Optional[User] = bot.get_user(discord_id) or fetched_users.get(
+            discord_id
+        )
+        if user is None:
+            uncached.append(discord_id)
+            continue
+        users[discord_id] = user
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_user_bounded(discord_id: int) -> Optional[User]:
+        async with semaphore:
+            return await fetch_user(bot, discord_id)
+
+    fetched: List[Optional[User]] = await asyncio.gather(
+        *(fetch_user_bounded(discord_id) for discord_id in uncached)
+    )
+    for discord_id, fetched_user in zip(uncached, fetched):
+        if fetched_user is not None:
+            users[discord_id] = fetched_user
+    return users
 
 
 async def check_guild_channel(
@@ -52,6 +142,9 @@ async def check_guild_channel(
 
     if guild is not accessible, update the database with guild_id=0
 
+    channels that are resolved are cached in `alert_channels` until the
+    guild's channels or saved channel change
+
     parameters
     ----------
     bot: disnake.ext.commands.Bot
@@ -66,21 +159,30 @@ async def check_guild_channel(
     Optional[disnake.TextChannel]
         the saved channel if it exists and is accessible to the bot
     """
+    if not guild_id:
+        return None
+    watch_channel_id: Optional[int] = await db.get_watch_channel_id(guild_id)
+    if alert_channels.is_cached(guild_id, watch_channel_id):
+        return alert_channels.get(guild_id)
     guild_exists: Optional[Guild] = bot.get_guild(guild_id)
     guild_data: List[GuildData] = await db.get_guild_data(guild_id)
-    if guild_exists in bot.guilds and len(guild_data):
+    if guild_exists is not None and len(guild_data):
         # bot is still in the guild
-        watch_channel_id: Optional[int] = guild_data[0]["watch_channel"]
         if watch_channel_id is None:
             # no channel saved
+            alert_channels.set(guild_id, watch_channel_id, None)
             return
         channel_exists: Optional[
             Union[GuildChannel, Thread, PrivateChannel]
         ] = bot.get_channel(watch_channel_id)
-        guild_exists_channels: List[TextChannel] = guild_exists.text_channels
-        if channel_exists in guild_exists_channels:
+        if (
+            isinstance(channel_exists, TextChannel)
+            and channel_exists.guild.id == guild_id
+        ):
             # check if channel is still in the guild
+            alert_channels.set(guild_id, watch_channel_id, channel_exists)
             return channel_exists
+        guild_exists_channels: List[TextChannel] = guild_exists.text_channels
 
         # sends a warning that guild exists but channel is gone
         await db.update_guild_data(guild_id, watch_channel=0)
@@ -92,6 +194,7 @@ async def check_guild_channel(
     elif guild_id:
         # no longer have permission to DM user, just update guild data
         await db.update_player_data(discord_id, guild_id=0)
+        roster.update(discord_id, guild_id=0)
 
 
 async def wait_until_db_ready(database: Database) -> None:
@@ -118,8 +221,16 @@ class Background(Cog):
     ----------
     bot: disnake.ext.commands.Bot
         bot instance
+    alerts: helpers.alert_queue.AlertQueue
+        queue of alerts to send, per channel
     valorant_watch_cycle: disnake.ext.tasks.Loop
-        task to loop through all players and check for new matches
+        task to check the players that are due for new matches
+    valorant_assets_cycle: disnake.ext.tasks.Loop
+        task to load the valorant asset index and refresh it when stale
+    valorant_leaderboard_cycle: disnake.ext.tasks.Loop
+        task to refresh the leaderboard rows of all players daily
+    valorant_cleanup_cycle: disnake.ext.tasks.Loop
+        task to deactivate the players whose users no longer exist
     """
 
     def __init__(self, bot: Bot) -> None:
@@ -133,92 +244,331 @@ class Background(Cog):
         """
         self.bot: Bot = bot
         """bot instance"""
-        self.valorant_players: List[Player] = []
+        self.alerts: AlertQueue = AlertQueue()
+        """queue of alerts to send, per channel"""
+        self._cycle_lasttimes: Dict[int, int] = {}
+        self._cycle_users: Dict[int, User] = {}
+        self._probe_skips: Dict[int, int] = {}
         self.valorant_watch_cycle.add_exception_type(
             ConnectionError, ValueError
         )
         self.valorant_watch_cycle.start()
+        self.valorant_assets_cycle.start()
+        self.valorant_leaderboard_cycle.start()
+        self.valorant_cleanup_cycle.start()
+
+    def cog_unload(self) -> None:
+        """stops sending queued alerts when the cog is unloaded"""
+        asyncio.create_task(self.alerts.close())
+
+    def build_agent_emojis(self) -> None:
+        """rebuilds the agent emoji index from all emojis the bot can use"""
+        agent_emojis.build(self.bot.emojis)
+
+    @Cog.listener()
+    async def on_ready(self) -> None:
+        """builds the agent emoji index once the bot is ready"""
+        self.build_agent_emojis()
+
+    @Cog.listener()
+    async def on_guild_emojis_update(
+        self, _guild: Guild, _before: Sequence[Emoji], _after: Sequence[Emoji]
+    ) -> None:
+        """rebuilds the agent emoji index when a guild's emojis change"""
+        self.build_agent_emojis()
+
+    @Cog.listener()
+    async def on_guild_join(self, _guild: Guild) -> None:
+        """rebuilds the agent emoji index to add the new guild's emojis"""
+        self.build_agent_emojis()
+
+    @Cog.listener()
+    async def on_guild_remove(self, guild: Guild) -> None:
+        """rebuilds the agent emoji index to remove the old guild's emojis
+        and forgets the guild's alert channel"""
+        self.build_agent_emojis()
+        alert_channels.invalidate(guild.id)
+
+    @Cog.listener()
+    async def on_guild_channel_delete(self, channel: GuildChannel) -> None:
+        """forgets the alert channel of the channel's guild so a deleted
+        alert channel is noticed"""
+        alert_channels.invalidate(channel.guild.id)
+
+    @Cog.listener()
+    async def on_guild_channel_update(
+        self, _before: GuildChannel, after: GuildChannel
+    ) -> None:
+        """forgets the alert channel of the channel's guild so changes to
+        the alert channel are noticed"""
+        alert_channels.invalidate(after.guild.id)
+
+    @Cog.listener()
+    async def on_button_click(self, inter: MessageInteraction) -> None:
+        """shows the page of an alert when its button is clicked
+
+        the page is rendered from the match in the cache or the database,
+        only to the user who clicked
+
+        parameters
+        ----------
+        inter: disnake.MessageInteraction
+            interaction of the clicked button
+        """
+        parsed: Optional[Tuple[str, str]] = parse_alert_custom_id(
+            inter.component.custom_id or ""
+        )
+        if parsed is None:
+            return
+        _page, match_id = parsed
+        await inter.response.defer(with_message=True, ephemeral=True)
+        match: Optional[Match] = await get_saved_match(match_id)
+        if match is None:
+            await inter.edit_original_message(
+                content="this match is no longer saved!"
+            )
+            return
+        await inter.edit_original_message(
+            embed=await match.stats_embed(self.bot)
+        )
+
+    async def acquire_watch_shards(self) -> None:
+        """tries to take ownership of the shards this replica is connected
+        to, so their players are watched by this replica
+
+        waits until the bot is ready, before then the shard count may not be
+        known and the guilds of the shards are not cached yet
+        """
+        await self.bot.wait_until_ready()
+        shard_count: int = self.bot.shard_count or 1
+        shard_ids: List[int] = list(self.bot.shard_ids or range(shard_count))
+        await watch_shards.acquire(shard_count, shard_ids)
 
     async def init_valorant_players(self) -> None:
-        """initialises the list of valorant players"""
+        """loads the roster of valorant players once the database is ready"""
         await wait_until_db_ready(db)
-        init_list: List[PlayerData] = await db.get_all_players()
-        self.valorant_players: List[Player] = [
-            Player(data) for data in init_list
-        ]
+        if roster.loaded:
+            return
+        await roster.load()
 
-    @tasks.loop()
-    async def valorant_watch_cycle(self) -> None:
-        """loops through all players and checks for new matches
+    async def may_have_new_match(self, player: Player) -> bool:
+        """checks if the player's match history should be fetched
+
+        players someone is waiting for are always fetched. otherwise the
+        newest stored match is probed, and the history is fetched anyway
+        every `PROBE_FULL_FETCH_EVERY` polls in case the stored matches are
+        behind
+
+        parameters
+        ----------
+        player: Player
+            player to check
 
-        if a new match is found, trigger and send the alert
+        returns
+        -------
+        bool
+            True if the match history should be fetched
         """
-        await wait_until_db_ready(db)
-        await self.init_valorant_players()
-        for player in self.valorant_players:
-            if not await check_user_exists(self.bot, player.player_id):
-                # delete user?
+        if player.player_id in watch_scheduler.waited:
+            return True
+        skips: int = self._probe_skips.pop(player.player_id, 0)
+        if skips + 1 >= PROBE_FULL_FETCH_EVERY:
+            return True
+        if await player.has_new_match():
+            return True
+        self._probe_skips[player.player_id] = skips + 1
+        return False
+
+    async def valorant_watch_player(
+        self, player: Player, guild_players: Dict[str, Player]
+    ) -> None:
+        """checks a player for new matches and queues the alerts
+
+        players whose lasttime was already advanced this cycle by a
+        guildmate's alert are skipped without fetching their match history,
+        and so are players whose newest stored match has been processed,
+        see `may_have_new_match`. players whose user was not resolved this
+        cycle are skipped. matches that do not alert, e.g. deathmatches,
+        still advance the player's lasttime. alerts are sent by `alerts` so
+        discord latency does not slow polling
+
+        parameters
+        ----------
+        player: Player
+            player to check
+        guild_players: Dict[str, Player]
+            players in the player's guild by puuid
+        """
+        if player.lasttime > self._cycle_lasttimes.get(
+            player.player_id, player.lasttime
+        ):
+            # match was already alerted by a guildmate
+            return
+        user: Optional[User] = self._cycle_users.get(player.player_id)
+        if user is None:
+            return
+        if not await self.may_have_new_match(player):
+            return
+        channel: Union[TextChannel, User] = user
+        guild_channel: Optional[TextChannel] = await check_guild_channel(
+            self.bot, player.guild_id, player.player_id
+        )
+        if guild_channel is not None:
+            channel = guild_channel
+        matches: List[Match] = await player.get_match_history()
+        for match in matches:
+            if match.game_end <= player.lasttime:
                 continue
-            channel: Optional[Union[TextChannel, User]]
-            channel = await check_guild_channel(
-                self.bot, player.guild_id, player.player_id
-            ) or await self.bot.getch_user(player.player_id)
-            if channel is None:
+            alert: Optional[DiscordReturn] = await match.trigger_alert(
+                player, guild_players
+            )
+            if match.game_end > player.lasttime:
+                # ignored e.g. deathmatch, move past it so the probe does not
+                # find it again every poll
+                player.lasttime = match.game_end
+                await db.update_player_data(
+                    player.player_id, lastTime=match.game_end
+                )
+            if alert is None:
+                continue
+            alert_embed: Optional[Embed] = alert.get("embed")
+            if alert_embed is None:
                 continue
-            matches: List[Match] = await player.get_match_history()
-            for match in matches:
-                if match.game_end <= player.lasttime:
-                    continue
-                alert: Optional[DiscordReturn] = await match.trigger_alert(
-                    player, self.valorant_players
+            self.alerts.put(
+                Alert(
+                    channel=channel,
+                    content=alert.get("content", ""),
+                    embed=alert_embed,
+                    match_id=match.match_id,
                 )
-                if alert is None:
-                    continue
-                reply: Message = await channel.send(**alert)
-                alert_embed: Optional[Embed] = alert.get("embed")
-                if alert_embed is None:
-                    continue
-                embeds: List[SelectEmbed] = [
-                    SelectEmbed(
-                        embed=alert_embed,
-                        name="alert",
-                        description="match alert",
-                        emoji="🔔",
-                    ),
-                    SelectEmbed(
-                        embed=await match.stats_embed(self.bot),
-                        name="stats",
-                        description="match stats",
-                        emoji="📊",
-                    ),
-                ]
-                await reply.edit(
-                    view=PageView(
-                        reply=reply,
-                        embeds=embeds,
-                        timeout=60 * 60,
-                        reset_to_home=True,
+            )
+
+    async def valorant_watch_worker(
+        self, queue: "asyncio.Queue[Tuple[int, List[Player]]]"
+    ) -> None:
+        """takes the players of a guild from the queue and checks them one
+        after the other until the queue is empty
+
+        a guild's players are only checked by one worker, so guildmates do
+        not alert the same match twice. each player is rescheduled once
+        checked, sooner if they just played. errors from a single player are
+        printed and do not stop the worker
+
+        parameters
+        ----------
+        queue: asyncio.Queue[Tuple[int, List[Player]]]
+            queue of guild ids and their players left to check in this cycle
+        """
+        while not queue.empty():
+            guild_id, players = queue.get_nowait()
+            guild_players: Dict[str, Player] = roster.guild_players(guild_id)
+            for player in players:
+                try:
+                    await self.valorant_watch_player(player, guild_players)
+                except (ConnectionError, ValueError) as err:
+                    print(f"error watching {player}: ", err)
+                finally:
+                    watch_scheduler.reschedule(
+                        player.player_id, player.lasttime
                     )
-                )
 
-            # sleeps for number of seconds (avoid rate limit)
-            await asyncio.sleep(0.5)
+    @tasks.loop(seconds=10)
+    async def valorant_watch_cycle(self) -> None:
+        """checks the players that are due for new matches using a pool of
+        workers, grouped by guild
+
+        if a new match is found, trigger and send the alert. players are
+        polled more often right after a match and less often the longer they
+        have not played, see `helpers.scheduler.WatchScheduler`. requests to
+        the api are rate limited by the shared limiter. only the players on
+        the shards owned by this replica are checked, see
+        `helpers.sharding.WatchShards`. the players someone is waiting for
+        are read from the waitlist every cycle, as the wait may have been
+        handled by another replica
+        """
+        await wait_until_db_ready(db)
+        await self.init_valorant_players()
+        await self.acquire_watch_shards()
+        watch_scheduler.sync(
+            player.player_id
+            for player in roster.players
+            if watch_shards.owns(player.guild_id, player.puuid)
+        )
+        watch_scheduler.set_waited(await db.get_waited_ids())
+        self._cycle_lasttimes = {}
+        due: List[int] = watch_scheduler.pop_due()
+        self._cycle_users = await resolve_users(self.bot, due)
+        # guilds are queued in order of their first due player, so guilds
+        # of waited players come first
+        guilds: Dict[int, List[Player]] = {}
+        for player_id in due:
+            player: Optional[Player] = roster.get(player_id)
+            if player is None:
+                continue
+            self._cycle_lasttimes[player.player_id] = player.lasttime
+            guilds.setdefault(player.guild_id or 0, []).append(player)
+        queue: "asyncio.Queue[Tuple[int, List[Player]]]" = asyncio.Queue()
+        for guild in guilds.items():
+            queue.put_nowait(guild)
+        await asyncio.gather(
+            *(self.valorant_watch_worker(queue) for _ in range(WATCH_WORKERS))
+        )
+        match_cache.purge()
+
+    @tasks.loop(hours=24)
+    async def valorant_leaderboard_cycle(self) -> None:
+        """refreshes the leaderboard rows of all players so matches older
+        than the leaderboard window stop counting. rows are also refreshed
+        whenever a player's matches are saved. saved matches older than the
+        window are deleted, their alert buttons stop working. only run by
+        the replica owning shard 0"""
+        await wait_until_db_ready(db)
+        await self.acquire_watch_shards()
+        if 0 not in watch_shards.owned:
+            return
+        await db.refresh_leaderboard()
+        await db.delete_matches_before(time.time() - LEADERBOARD_WINDOW)
+
+    @tasks.loop(hours=1)
+    async def valorant_cleanup_cycle(self) -> None:
+        """deactivates the players whose users were found to no longer exist
+
+        deactivated players are removed from the roster so they are not
+        checked again. their data is kept and they are reactivated when
+        saved again, e.g. by valorant-watch
+        """
+        await wait_until_db_ready(db)
+        await self.init_valorant_players()
+        for player_id in missing_users.keys():
+            missing_users.pop(player_id)
+            if roster.get(player_id) is None:
+                continue
+            await db.deactivate_player(player_id)
+            roster.remove(player_id)
+            watch_scheduler.remove(player_id)
+            print(f"deactivated player {player_id}, user no longer exists")
+
+    @tasks.loop(hours=1)
+    async def valorant_assets_cycle(self) -> None:
+        """loads the valorant asset index, refreshing it from the api once it
+        is older than its ttl"""
+        await assets.load()
 
     @tasks.loop(hours=24)
     async def update_player_data(self) -> None:
         """loops through all players and updates their name and tag"""
         await wait_until_db_ready(db)
         await self.init_valorant_players()
-        init_list: List[PlayerData] = await db.get_all_players()
-        players: List[Player] = [Player(data) for data in init_list]
+        players: List[Player] = roster.players
+        users: Dict[int, User] = await resolve_users(
+            self.bot, [player.player_id for player in players]
+        )
         for player in players:
-            if not await check_user_exists(self.bot, player.player_id):
-                # delete user?
+            if player.player_id not in users:
+                # deactivated by valorant_cleanup_cycle if missing
                 continue
             await player.update_name_tag()
             await player.update_db()
-            # sleeps for number of seconds (avoid rate limit)
-            await asyncio.sleep(0.5)
 
 
 def setup(bot: Bot) -> None:
@@ -1,4 +1,5 @@
 """custom help command"""
+from functools import partial
 from typing import List, Optional, Tuple, Union
 
 import disnake
@@ -87,7 +88,7 @@ class Help(HelpCommand):
                         name=cog_name,
                         description=description,
                         emoji=emoji,
-                        embed=await self.cog_help_embed(cog),
+                        factory=partial(self.cog_help_embed, cog),
                     )
                 )
 
@@ -135,6 +135,30 @@ class Valorant(commands.Cog, name="valorant"):
         """
         await ctx.reply(**await valorant.waitlist(ctx))
 
+    @commands.command(
+        name="valorant-leaderboard",
+        aliases=["valorantleaderboard", "valleaderboard", "vlb"],
+        description="ranks the server's watched players",
+    )
+    @commands.guild_only()
+    async def valorant_leaderboard(
+        self, ctx: commands.Context, sort: str = "acs"
+    ) -> None:
+        """ranks the server's watched players by their matches of the last
+        30 days
+
+        parameters
+        ----------
+        sort: str
+            the stat to rank by: acs, headshot_rate, win_rate, streak or
+            games (default: acs)
+
+        example
+        -------
+        >>> valorant-leaderboard win_rate
+        """
+        await ctx.reply(**await valorant.leaderboard(ctx, sort))
+
 
 class ValorantAdmin(commands.Cog, name="valorant admin"):
     """valorant admin commands"""
@@ -105,6 +105,37 @@ class Valorant(commands.Cog):
         await inter.response.defer()
         await inter.edit_original_message(**await valorant.waitlist(inter))
 
+    class LeaderboardSort(str, Enum):
+        """stats the leaderboard can be ranked by"""
+
+        ACS = "acs"
+        HEADSHOT_RATE = "headshot_rate"
+        WIN_RATE = "win_rate"
+        STREAK = "streak"
+        GAMES = "games"
+
+    @commands.slash_command(
+        name="valorant-leaderboard",
+        description="ranks the server's watched players",
+    )
+    async def valorant_leaderboard(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        sort: LeaderboardSort = LeaderboardSort.ACS,
+    ) -> None:
+        """ranks the server's watched players by their matches of the last
+        30 days
+
+        parameters
+        ----------
+        sort: LeaderboardSort
+            the stat to rank by (default: acs)
+        """
+        await inter.response.defer()
+        await inter.edit_original_message(
+            **await valorant.leaderboard(inter, sort.value)
+        )
+
 
 class ValorantAdmin(commands.Cog):
     """valorant admin commands"""
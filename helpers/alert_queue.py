@@ -0,0 +1,238 @@
+"""delivery of valorant watch alerts to discord channels"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+from disnake import (
+    ButtonStyle,
+    Embed,
+    Message,
+    TextChannel,
+    User,
+)
+from disnake.ui import Button
+
+from helpers.ratelimit import TokenBucket
+
+# prefix of the custom_id of alert buttons. the buttons are not tied to a
+# view in memory, clicks are handled by `Background.on_button_click` from the
+# custom_id alone so they keep working after a restart
+ALERT_CUSTOM_ID = "valorant-alert"
+ALERT_PAGES = ("stats",)
+
+
+def alert_custom_id(page: str, match_id: str) -> str:
+    """returns the custom_id of the button showing a page of an alert
+
+    parameters
+    ----------
+    page: str
+        page to show, one of `ALERT_PAGES`
+    match_id: str
+        id of the alerted match
+
+    returns
+    -------
+    str
+        custom_id encoding the page and the match id
+    """
+    return f"{ALERT_CUSTOM_ID}:{page}:{match_id}"
+
+
+def parse_alert_custom_id(custom_id: str) -> Optional[Tuple[str, str]]:
+    """returns the page and match id encoded in the custom_id of an alert
+    button
+
+    parameters
+    ----------
+    custom_id: str
+        custom_id of the clicked button
+
+    returns
+    -------
+    Optional[Tuple[str, str]]
+        page and match id, None if not an alert button
+    """
+    prefix, _, rest = custom_id.partition(":")
+    page, _, match_id = rest.partition(":")
+    if prefix != ALERT_CUSTOM_ID or page not in ALERT_PAGES or not match_id:
+        return None
+    return page, match_id
+
+
+@dataclass
+class Alert:
+    """an alert waiting to be sent
+
+    parameters
+    ----------
+    channel: Union[TextChannel, User]
+        channel or user to send the alert to
+    content: str
+        message content e.g. waiters to ping
+    embed: Embed
+        alert embed
+    match_id: str
+        id of the alerted match, used to show its pages
+    """
+
+    channel: Union[TextChannel, User]
+    """channel or user to send the alert to"""
+    content: str = ""
+    """message content e.g. waiters to ping"""
+    embed: Embed = field(default_factory=Embed)
+    """alert embed"""
+    match_id: str = ""
+    """id of the alerted match, used to show its pages"""
+
+
+class AlertQueue:
+    """queues alerts per channel and sends them in the background so polling
+    does not wait on discord
+
+    each channel has its own worker, which is limited to discord's
+    per-channel rate limit of 5 messages every 5 seconds. alerts for the same
+    channel queued within `window` seconds of each other are coalesced into
+    one message with an embed per alert
+
+    attributes
+    ----------
+    window: float
+        seconds to wait for more alerts for the same channel before sending
+    max_alerts: int
+        maximum number of alerts coalesced into one message
+    idle: float
+        seconds without alerts after which a channel's worker stops
+    """
+
+    def __init__(
+        self, window: float = 2, max_alerts: int = 5, idle: float = 60
+    ) -> None:
+        """initialises an empty queue
+
+        parameters
+        ----------
+        window: float
+            seconds to wait for more alerts for the same channel before
+            sending
+        max_alerts: int
+            maximum number of alerts coalesced into one message
+        idle: float
+            seconds without alerts after which a channel's worker stops
+        """
+        self.window: float = window
+        """seconds to wait for more alerts for the same channel before
+        sending"""
+        self.max_alerts: int = max_alerts
+        """maximum number of alerts coalesced into one message"""
+        self.idle: float = idle
+        """seconds without alerts after which a channel's worker stops"""
+        self._queues: Dict[int, "asyncio.Queue[Alert]"] = {}
+        self._workers: Dict[int, "asyncio.Task[None]"] = {}
+        self._limiters: Dict[int, TokenBucket] = {}
+
+    def put(self, alert: Alert) -> None:
+        """queues the alert, starting its channel's worker if needed
+
+        parameters
+        ----------
+        alert: Alert
+            alert to send
+        """
+        channel_id: int = alert.channel.id
+        if channel_id not in self._queues:
+            self._queues[channel_id] = asyncio.Queue()
+            # discord allows 5 messages per channel in any 5 seconds
+            self._limiters[channel_id] = TokenBucket.per_period(5, 5, burst=2)
+            self._workers[channel_id] = asyncio.create_task(
+                self._worker(channel_id)
+            )
+        self._queues[channel_id].put_nowait(alert)
+
+    async def _worker(self, channel_id: int) -> None:
+        """sends the alerts of a channel until it has been idle for `idle`
+        seconds
+
+        errors sending a message are printed and do not stop the worker. if
+        the worker stops anyway, its channel is forgotten so the next alert
+        starts a new worker
+
+        parameters
+        ----------
+        channel_id: int
+            id of the channel to send alerts to
+        """
+        queue: "asyncio.Queue[Alert]" = self._queues[channel_id]
+        limiter: TokenBucket = self._limiters[channel_id]
+        try:
+            while True:
+                try:
+                    alert: Alert = await asyncio.wait_for(
+                        queue.get(), self.idle
+                    )
+                except asyncio.TimeoutError:
+                    if queue.empty():
+                        return
+                    continue
+                await asyncio.sleep(self.window)
+                alerts: List[Alert] = [alert]
+                while not queue.empty() and len(alerts) < self.max_alerts:
+                    alerts.append(queue.get_nowait())
+                await limiter.acquire()
+                try:
+                    await self.send(alerts)
+                except Exception as err:
+                    # e.g. HTTPException or a dropped connection, the next
+                    # alerts may still be sent
+                    print(f"error sending alerts to {channel_id}: ", err)
+        finally:
+            if self._workers.get(channel_id) is asyncio.current_task():
+                del self._queues[channel_id]
+                del self._limiters[channel_id]
+                del self._workers[channel_id]
+
+    @staticmethod
+    async def send(alerts: List[Alert]) -> Message:
+        """sends the alerts to their channel in one message with an embed
+        and a button per page for each alert
+
+        buttons of coalesced alerts are numbered in the order of the embeds
+
+        parameters
+        ----------
+        alerts: List[Alert]
+            alerts for the same channel
+
+        returns
+        -------
+        Message
+            the message sent
+        """
+        buttons: List[Button] = []
+        for i, alert in enumerate(alerts, start=1):
+            if not alert.match_id:
+                continue
+            buttons.append(
+                Button(
+                    label="stats" if len(alerts) == 1 else f"stats {i}",
+                    emoji="📊",
+                    style=ButtonStyle.secondary,
+                    custom_id=alert_custom_id("stats", alert.match_id),
+                )
+            )
+        content: str = "\n".join(
+            [alert.content for alert in alerts if alert.content]
+        )
+        return await alerts[0].channel.send(
+            content=content or None,
+            embeds=[alert.embed for alert in alerts],
+            components=buttons,
+        )
+
+    async def close(self) -> None:
+        """stops all workers, dropping alerts that have not been sent"""
+        for worker in list(self._workers.values()):
+            worker.cancel()
+        self._queues.clear()
+        self._limiters.clear()
+        self._workers.clear()
@@ -0,0 +1,121 @@
+"""in-memory caches"""
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, List, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """cache where each entry expires a fixed number of seconds after it was
+    set. once full, the oldest entries are evicted first
+
+    attributes
+    ----------
+    ttl: float
+        seconds each entry stays valid for
+    maxsize: int
+        maximum number of entries kept
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024) -> None:
+        """initialises an empty cache
+
+        parameters
+        ----------
+        ttl: float
+            seconds each entry stays valid for
+        maxsize: int
+            maximum number of entries kept
+        """
+        self.ttl: float = ttl
+        """seconds each entry stays valid for"""
+        self.maxsize: int = maxsize
+        """maximum number of entries kept"""
+        self._data: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: K) -> Optional[V]:
+        """returns the value for key if it has not expired
+
+        parameters
+        ----------
+        key: K
+            key to look up
+
+        returns
+        -------
+        Optional[V]
+            cached value, or None if missing or expired
+        """
+        entry: Optional[Tuple[float, V]] = self._data.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        """sets the value for key, evicting the oldest entry if full
+
+        parameters
+        ----------
+        key: K
+            key to set
+        value: V
+            value to cache
+        """
+        self._data.pop(key, None)
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> Optional[V]:
+        """removes key from the cache
+
+        parameters
+        ----------
+        key: K
+            key to remove
+
+        returns
+        -------
+        Optional[V]
+            the removed value if it had not expired, None otherwise
+        """
+        value: Optional[V] = self.get(key)
+        self._data.pop(key, None)
+        return value
+
+    def keys(self) -> List[K]:
+        """returns the keys that have not expired, oldest first
+
+        returns
+        -------
+        List[K]
+            keys of the valid entries
+        """
+        self.purge()
+        return list(self._data)
+
+    def purge(self) -> None:
+        """removes all expired entries"""
+        now: float = time.monotonic()
+        # entries are kept in order of expiry
+        while self._data:
+            key: K = next(iter(self._data))
+            if self._data[key][0] >= now:
+                break
+            del self._data[key]
+
+    def clear(self) -> None:
+        """removes all entries"""
+        self._data.clear()
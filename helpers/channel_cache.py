@@ -0,0 +1,99 @@
+"""cache of the channels guilds send valorant alerts to"""
+from typing import Dict, Optional, Tuple
+
+from disnake import TextChannel
+
+# id of the channel saved for a guild and the channel resolved from it
+ChannelEntry = Tuple[Optional[int], Optional[TextChannel]]
+
+
+class AlertChannelCache:
+    """resolved alert channel of each guild
+
+    resolving a guild's alert channel checks that the channel still exists
+    in the guild, so the result is cached until the guild's channels change.
+    each entry also keeps the watch_channel id it was resolved from, so an
+    entry is ignored once the guild's saved channel changes, including
+    changes made by other processes
+    """
+
+    def __init__(self) -> None:
+        """initialises an empty cache"""
+        self._channels: Dict[int, ChannelEntry] = {}
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def is_cached(
+        self, guild_id: int, watch_channel_id: Optional[int]
+    ) -> bool:
+        """checks if the guild's channel was resolved from watch_channel_id
+
+        parameters
+        ----------
+        guild_id: int
+            discord id of the guild
+        watch_channel_id: Optional[int]
+            id of the channel currently saved for the guild
+
+        returns
+        -------
+        bool
+            True if `get` returns the resolved channel
+        """
+        entry: Optional[ChannelEntry] = self._channels.get(guild_id)
+        return entry is not None and entry[0] == watch_channel_id
+
+    def get(self, guild_id: int) -> Optional[TextChannel]:
+        """returns the resolved channel of the guild
+
+        parameters
+        ----------
+        guild_id: int
+            discord id of the guild
+
+        returns
+        -------
+        Optional[disnake.TextChannel]
+            the channel if resolved, None if not cached or no channel is set
+        """
+        entry: Optional[ChannelEntry] = self._channels.get(guild_id)
+        if entry is None:
+            return None
+        return entry[1]
+
+    def set(
+        self,
+        guild_id: int,
+        watch_channel_id: Optional[int],
+        channel: Optional[TextChannel],
+    ) -> None:
+        """caches the channel resolved for the guild
+
+        parameters
+        ----------
+        guild_id: int
+            discord id of the guild
+        watch_channel_id: Optional[int]
+            id of the channel saved for the guild
+        channel: Optional[disnake.TextChannel]
+            the resolved channel, None if no channel is set
+        """
+        self._channels[guild_id] = (watch_channel_id, channel)
+
+    def invalidate(self, guild_id: int) -> None:
+        """removes the guild's channel so it is resolved again
+
+        parameters
+        ----------
+        guild_id: int
+            discord id of the guild
+        """
+        self._channels.pop(guild_id, None)
+
+    def clear(self) -> None:
+        """removes all channels"""
+        self._channels.clear()
+
+
+alert_channels = AlertChannelCache()
@@ -2,9 +2,8 @@
 import os
 from typing import Optional
 
-import aiohttp
-
 from helpers.helpers import DiscordReturn
+from helpers.http_client import http_client
 
 COINAPI_TOKEN: Optional[str] = os.getenv("CRYPTO_TOKEN")
 
@@ -25,14 +24,14 @@ async def price(sym: str) -> DiscordReturn:
         content: str
             price of coin in USD
     """
-    async with aiohttp.ClientSession() as session:
-        url: str = f"https://rest.coinapi.io/v1/exchangerate/{sym}/USD"
-        headers: dict[str, Optional[str]] = {"X-CoinAPI-Key": COINAPI_TOKEN}
-        content: str = "error getting price"
-        async with session.get(url, headers=headers) as request:
-            if request.status == 200:
-                data: dict = await request.json()
-                content: str = f"1 {sym} = {data.get('rate'):.2f} USD"
-        return {
-            "content": content,
-        }
+    url: str = f"https://rest.coinapi.io/v1/exchangerate/{sym}/USD"
+    headers: dict[str, Optional[str]] = {"X-CoinAPI-Key": COINAPI_TOKEN}
+    content: str = "error getting price"
+    try:
+        data: dict = await http_client.get_json(url, headers=headers)
+        content = f"1 {sym} = {data.get('rate'):.2f} USD"
+    except ConnectionError:
+        pass
+    return {
+        "content": content,
+    }
@@ -1,8 +1,15 @@
 """helper functions for database operations"""
-from typing import List, Optional, TypedDict
+import copy
+import datetime
+import json
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, TypedDict
 
 from asyncpg import create_pool
-from asyncpg.pool import Pool
+from asyncpg.pool import Pool, PoolConnectionProxy
+
+from helpers.migrations import migrate
 
 
 class GuildData(TypedDict):
@@ -77,6 +84,9 @@ class PlayerData(TypedDict):
         list of acs for the player per game
     rank: Optional[str]
         valorant rank of the player
+    deactivated_at: Optional[datetime.datetime]
+        when the player was deactivated because their user no longer
+        exists, None if active
     """
 
     player_id: int
@@ -105,6 +115,9 @@ class PlayerData(TypedDict):
     """list of acs for the player per game"""
     rank: Optional[str]
     """valorant rank of the player"""
+    deactivated_at: Optional[datetime.datetime]
+    """when the player was deactivated because their user no longer exists,
+    None if active"""
 
 
 class WaitlistData(TypedDict):
@@ -155,11 +168,170 @@ class PlayerWaitlistData(PlayerData, WaitlistData):
         list of acs for the player per game
     rank: Optional[str]
         valorant rank of the player
+    deactivated_at: Optional[datetime.datetime]
+        when the player was deactivated because their user no longer
+        exists, None if active
     waiting_id: Optional[List[int]]
         list of discord ids of players who are waiting for the player
     """
 
 
+class PlayerMatchData(TypedDict):
+    """schema for player_matches table
+
+    attributes
+    ----------
+    puuid: str
+        valorant puuid of the player
+    match_id: str
+        id of the match
+    guild_id: Optional[int]
+        discord id of the guild the player was in
+    game_end: float
+        unix timestamp of when the match ended
+    mode: Optional[str]
+        gamemode of the match
+    map: Optional[str]
+        name of the map played
+    agent: Optional[str]
+        name of the agent played
+    kills: Optional[int]
+        kills in the match
+    deaths: Optional[int]
+        deaths in the match
+    assists: Optional[int]
+        assists in the match
+    score: Optional[int]
+        combat score in the match
+    acs: Optional[float]
+        average combat score per round in the match
+    headshots: Optional[int]
+        headshots in the match
+    bodyshots: Optional[int]
+        bodyshots in the match
+    legshots: Optional[int]
+        legshots in the match
+    result: Optional[int]
+        1 if the player won, -1 if they lost, 0 if draw
+    rank: Optional[str]
+        valorant rank of the player at the time of the match
+    """
+
+    puuid: str
+    """valorant puuid of the player"""
+    match_id: str
+    """id of the match"""
+    guild_id: Optional[int]
+    """discord id of the guild the player was in"""
+    game_end: float
+    """unix timestamp of when the match ended"""
+    mode: Optional[str]
+    """gamemode of the match"""
+    map: Optional[str]
+    """name of the map played"""
+    agent: Optional[str]
+    """name of the agent played"""
+    kills: Optional[int]
+    """kills in the match"""
+    deaths: Optional[int]
+    """deaths in the match"""
+    assists: Optional[int]
+    """assists in the match"""
+    score: Optional[int]
+    """combat score in the match"""
+    acs: Optional[float]
+    """average combat score per round in the match"""
+    headshots: Optional[int]
+    """headshots in the match"""
+    bodyshots: Optional[int]
+    """bodyshots in the match"""
+    legshots: Optional[int]
+    """legshots in the match"""
+    result: Optional[int]
+    """1 if the player won, -1 if they lost, 0 if draw"""
+    rank: Optional[str]
+    """valorant rank of the player at the time of the match"""
+
+
+PLAYER_MATCH_COLUMNS = list(PlayerMatchData.__annotations__)
+
+
+class MatchData(TypedDict):
+    """schema for matches table
+
+    attributes
+    ----------
+    match_id: str
+        id of the match
+    game_end: float
+        unix timestamp of when the match ended
+    data: Dict[str, Any]
+        match data to rebuild the match from, see `Match.to_data`
+    """
+
+    match_id: str
+    """id of the match"""
+    game_end: float
+    """unix timestamp of when the match ended"""
+    data: Dict[str, Any]
+    """match data to rebuild the match from, see `Match.to_data`"""
+
+
+class LeaderboardData(TypedDict):
+    """schema for guild_leaderboard table
+
+    attributes
+    ----------
+    player_id: int
+        discord id of the player
+    guild_id: Optional[int]
+        discord id of the guild the player is in
+    games: int
+        number of matches saved in the leaderboard window
+    wins: int
+        number of matches won in the leaderboard window
+    acs: float
+        average acs in the leaderboard window
+    headshot_rate: float
+        fraction of shots that were headshots in the leaderboard window
+    win_rate: float
+        fraction of matches won in the leaderboard window
+    streak: int
+        current streak of the player
+    rank: Optional[str]
+        valorant rank of the player
+    updated_at: datetime.datetime
+        when the row was last refreshed
+    """
+
+    player_id: int
+    """discord id of the player"""
+    guild_id: Optional[int]
+    """discord id of the guild the player is in"""
+    games: int
+    """number of matches saved in the leaderboard window"""
+    wins: int
+    """number of matches won in the leaderboard window"""
+    acs: float
+    """average acs in the leaderboard window"""
+    headshot_rate: float
+    """fraction of shots that were headshots in the leaderboard window"""
+    win_rate: float
+    """fraction of matches won in the leaderboard window"""
+    streak: int
+    """current streak of the player"""
+    rank: Optional[str]
+    """valorant rank of the player"""
+    updated_at: datetime.datetime
+    """when the row was last refreshed"""
+
+
+# columns the leaderboard can be sorted by
+LEADERBOARD_ORDERS = ("acs", "headshot_rate", "win_rate", "streak", "games")
+# only matches that ended in the last 30 days count towards the leaderboard
+LEADERBOARD_WINDOW: float = 60 * 60 * 24 * 30
+
+
 class Database:
     """postgres database to access and store data
 
@@ -169,6 +341,11 @@ class Database:
         database pool
     loaded: bool
         whether database is loaded
+    application_name: str
+        unique name of this process's connections, used to tell apart
+        notifications sent by this process from those sent by others
+    guilds: Optional[Dict[int, GuildData]]
+        cache of all rows in the guilds table by guild_id, None until loaded
     """
 
     def __init__(self) -> None:
@@ -177,6 +354,14 @@ class Database:
         """database pool"""
         self.loaded: bool = False
         """whether database is loaded"""
+        self.application_name: str = f"laffey-bot-{uuid.uuid4().hex[:16]}"
+        """unique name of this process's connections, used to tell apart
+        notifications sent by this process from those sent by others"""
+        self._listener: Optional[PoolConnectionProxy] = None
+        self._locker: Optional[PoolConnectionProxy] = None
+        self.guilds: Optional[Dict[int, GuildData]] = None
+        """cache of all rows in the guilds table by guild_id, None until
+        loaded"""
 
     async def create_db_pool(self, url: str) -> None:
         """creates a database pool with the given url and assigns it to db.
@@ -191,76 +376,57 @@ class Database:
         ConnectionError
             if database could not be connected to
         """
-        _db: Optional[Pool] = await create_pool(url)
+        _db: Optional[Pool] = await create_pool(
+            url, server_settings={"application_name": self.application_name}
+        )
         if _db is None:
             raise ConnectionError("could not connect to database")
         self.database = _db
 
-    async def create_guilds_table(self) -> str:
-        """attempts to create guilds table
+    async def listen(self, channel: str, callback: Callable[..., Any]) -> None:
+        """listens for notifications on the channel with a dedicated
+        connection from the pool
 
-        returns
-        -------
-        str
-            output of the query
+        parameters
+        ----------
+        channel: str
+            channel to listen on
+        callback: Callable[..., Any]
+            called with (connection, pid, channel, payload) for each
+            notification. can be a coroutine function
         """
-        return await self.database.execute(
-            """CREATE TABLE IF NOT EXISTS public.guilds(
-            guild_id bigint NOT NULL,
-            prefix text COLLATE pg_catalog."default",
-            watch_channel bigint,
-            ping_role bigint,
-            ping_image text COLLATE pg_catalog."default",
-            feeder_messages text[] COLLATE pg_catalog."default",
-            feeder_images text[] COLLATE pg_catalog."default",
-            streaker_messages text[] COLLATE pg_catalog."default"
-            )"""
-        )
+        if self._listener is None:
+            self._listener = await self.database.acquire()
+        await self._listener.add_listener(channel, callback)
 
-    async def create_players_table(self) -> str:
-        """attempts to create players table
+    async def try_advisory_lock(self, classid: int, objid: int) -> bool:
+        """takes the session advisory lock (classid, objid) on a dedicated
+        connection from the pool without waiting
 
-        returns
-        -------
-        str
-            output of the query
-        """
-        return await self.database.execute(
-            """CREATE TABLE IF NOT EXISTS public.players(
-            player_id bigint NOT NULL,
-            guild_id bigint,
-            name text COLLATE pg_catalog."default",
-            tag text COLLATE pg_catalog."default",
-            region text COLLATE pg_catalog."default",
-            puuid text COLLATE pg_catalog."default",
-            lastTime double precision,
-            streak integer,
-            headshots integer[],
-            bodyshots integer[],
-            legshots integer[],
-            acs double precision[],
-            rank text COLLATE pg_catalog."default"
-            )"""
-        )
+        the lock is held until the connection is closed, so it is released
+        if this process stops. locks already held are not taken again
 
-    async def create_waitlist_table(self) -> str:
-        """attempts to create waitlist table
+        parameters
+        ----------
+        classid: int
+            first key of the lock, shared by locks of the same kind
+        objid: int
+            second key of the lock
 
         returns
         -------
-        str
-            output of the query
+        bool
+            True if the lock was taken, False if held by another session
         """
-        return await self.database.execute(
-            """CREATE TABLE IF NOT EXISTS public.waitlist(
-            player_id bigint NOT NULL,
-            waiting_id bigint[]
-            )"""
+        if self._locker is None:
+            self._locker = await self.database.acquire()
+        return await self._locker.fetchval(
+            "select pg_try_advisory_lock($1, $2)", classid, objid
         )
 
     async def load_db(self, url: str) -> None:
-        """creates database pool and tables with the given url and sets loaded
-        to True
+        """creates database pool with the given url, applies pending schema
+        migrations and sets loaded to True
 
         parameters
         ----------
@@ -270,17 +436,123 @@ class Database:
         raises
         ------
         ConnectionError
-            if database could not be connected to
+            if database could not be connected to or a migration failed
         """
         await self.create_db_pool(url)
-        await self.create_guilds_table()
-        await self.create_players_table()
-        await self.create_waitlist_table()
+        await migrate(self.database)
+        await self.load_guilds()
         self.loaded = True
 
+    async def load_guilds(self) -> None:
+        """loads all rows in the guilds table into the cache and listens for
+        changes made by other processes"""
+        await self.listen("guilds", self._on_guilds_change)
+        rows: List[GuildData] = await self.database.fetch(
+            "select * from guilds"
+        )
+        self.guilds = {row["guild_id"]: GuildData(**row) for row in rows}
+
+    async def _on_guilds_change(
+        self, _connection: Any, _pid: int, _channel: str, payload: str
+    ) -> None:
+        """applies a change to the guilds table made by another process to
+        the cache
+
+        parameters
+        ----------
+        _connection: Any
+            connection the notification was received on
+        _pid: int
+            backend pid of the notifying session
+        _channel: str
+            channel the notification was sent on
+        payload: str
+            json object with the operation, id and origin
+        """
+        change: Dict[str, Any] = json.loads(payload)
+        if self.guilds is None:
+            return
+        if change.get("origin") == self.application_name:
+            # already applied when written
+            return
+        guild_id: int = change["id"]
+        rows: List[GuildData] = await self.database.fetch(
+            "select * from guilds where guild_id = $1", guild_id
+        )
+        if len(rows) == 0:
+            self.guilds.pop(guild_id, None)
+        else:
+            self.guilds[guild_id] = GuildData(**rows[0])
+
+    @staticmethod
+    def upsert_query(table: str, key: str, cols: List[str]) -> str:
+        """returns the query inserting a row into table, or updating the
+        columns of the row if one with the same key already exists. the key
+        is the first parameter followed by the columns in order
+
+        parameters
+        ----------
+        table: str
+            table to upsert into
+        key: str
+            primary key column of the table
+        cols: List[str]
+            columns to set
+
+        returns
+        -------
+        str
+            insert ... on conflict do update query
+        """
+        all_cols: str = ", ".join([key, *cols])
+        vals: str = ", ".join([f"${i+1}" for i in range(len(cols) + 1)])
+        # with nothing to update, set the key to itself to return the row
+        sets: str = ", ".join(
+            [f"{col} = excluded.{col}" for col in cols or [key]]
+        )
+        return (
+            f"insert into {table} ({all_cols}) values ({vals})"
+            + f" on conflict ({key}) do update set {sets}"
+        )
+
+    async def upsert(
+        self, table: str, key: str, key_value: int, **fields
+    ) -> str:
+        """inserts a row into table, or updates the fields of the row if one
+        with the same key already exists, in a single statement. specify
+        fields to set by using kwargs. e.g. key=value
+
+        parameters
+        ----------
+        table: str
+            table to upsert into
+        key: str
+            primary key column of the table
+        key_value: int
+            value of the primary key of the row
+        fields: dict
+            fields to set
+
+        returns
+        -------
+        str
+            "INSERT 0 1" if the row was inserted, "UPDATE 1" if updated
+        """
+        # xmax is 0 only for rows that were just inserted
+        inserted: bool = await self.database.fetchval(
+            self.upsert_query(table, key, list(fields.keys()))
+            + " returning (xmax = 0)",
+            key_value,
+            *fields.values(),
+        )
+        return "INSERT 0 1" if inserted else "UPDATE 1"
+
     async def get_guild_data(self, guild_id: int) -> List[GuildData]:
         """returns data for specified guild from guild_id
 
+        returned from the cache once loaded. the data is a copy and can be
+        modified without changing the cache
+
         parameters
         ----------
         guild_id: int
@@ -291,9 +563,39 @@ class Database:
         List[GuildData]
             data for specified guild
         """
-        return await self.database.fetch(
-            "select * from guilds where guild_id = $1", guild_id
-        )
+        if self.guilds is None:
+            return await self.database.fetch(
+                "select * from guilds where guild_id = $1", guild_id
+            )
+        guild_data: Optional[GuildData] = self.guilds.get(guild_id)
+        if guild_data is None:
+            return []
+        return [copy.deepcopy(guild_data)]
+
+    async def get_watch_channel_id(self, guild_id: int) -> Optional[int]:
+        """returns the id of the channel set for the guild
+
+        read from the cache once loaded without copying the guild's data
+
+        parameters
+        ----------
+        guild_id: int
+            discord id of the guild
+
+        returns
+        -------
+        Optional[int]
+            id of the channel, None if the guild or its channel is not set
+        """
+        if self.guilds is None:
+            return await self.database.fetchval(
+                "select watch_channel from guilds where guild_id = $1",
+                guild_id,
+            )
+        guild_data: Optional[GuildData] = self.guilds.get(guild_id)
+        if guild_data is None:
+            return None
+        return guild_data["watch_channel"]
 
     async def delete_guild_data(self, guild_id: int) -> str:
         """deletes data for specified guild from guild_id
@@ -308,9 +610,12 @@ class Database:
         str
             output of the query
         """
-        return await self.database.execute(
+        out: str = await self.database.execute(
             "delete from guilds where guild_id = $1", guild_id
         )
+        if self.guilds is not None:
+            self.guilds.pop(guild_id, None)
+        return out
 
     async def update_guild_data(self, guild_id: int, **fields) -> str:
         """updates data for specified guild from guild_id. specify fields to
@@ -326,41 +631,31 @@ class Database:
         returns
         -------
         str
-            output of the query
+            "INSERT 0 1" if the guild was inserted, "UPDATE 1" if updated
         """
-        # check if guild exists in database
-        data: List[GuildData] = await self.get_guild_data(guild_id)
-        if len(data) == 0:
-            # if guild does not exist, insert
-            cols: str = ", ".join(fields.keys())
-            vals: str = ", ".join([f"${i+2}" for i in range(len(fields))])
-            out: str = await self.database.execute(
-                f"insert into guilds (guild_id, {cols}) values ($1, {vals})",
-                guild_id,
-                *fields.values(),
-            )
-        else:
-            # if guild exists, update
-            list_of_vals: List[str] = [
-                f"{v} = ${i+2}" for i, v in enumerate(fields.keys())
-            ]
-            vals = ", ".join(list_of_vals)
-            out: str = await self.database.execute(
-                f"update guilds set {vals} where guild_id = $1",
-                guild_id,
-                *fields.values(),
-            )
+        out: str = await self.upsert("guilds", "guild_id", guild_id, **fields)
+        if self.guilds is not None:
+            guild_data: Optional[GuildData] = self.guilds.get(guild_id)
+            if guild_data is None:
+                guild_data = GuildData(
+                    **dict.fromkeys(GuildData.__annotations__)
+                )
+                guild_data["guild_id"] = guild_id
+                self.guilds[guild_id] = guild_data
+            guild_data.update(copy.deepcopy(fields))
         return out
 
     async def get_all_players(self) -> List[PlayerData]:
-        """returns all players in database
+        """returns all active players in database
 
         returns
         -------
         List[PlayerData]
-            all players in database
+            all players in database that are not deactivated
         """
-        return await self.database.fetch("select * from players")
+        return await self.database.fetch(
+            "select * from players where deactivated_at is null"
+        )
 
     async def get_players_ids(self) -> List[int]:
         """returns all player ids in database
@@ -426,6 +721,25 @@ class Database:
             "delete from players where player_id = $1", player_id
         )
 
+    async def deactivate_player(self, player_id: int) -> str:
+        """deactivates the player so they are no longer watched, keeping
+        their data. saving the player again reactivates them
+
+        parameters
+        ----------
+        player_id: int
+            discord id of the player to deactivate
+
+        returns
+        -------
+        str
+            output of the query
+        """
+        return await self.database.execute(
+            "update players set deactivated_at = now() where player_id = $1",
+            player_id,
+        )
+
     async def update_player_data(self, player_id: int, **fields) -> str:
         """updates data for specified player from player_id. specify fields to
         update by using kwargs. e.g. key=value
@@ -436,27 +750,268 @@ class Database:
             discord id of the player to update data for
         fields: dict
             fields to update
+
+        returns
+        -------
+        str
+            "INSERT 0 1" if the player was inserted, "UPDATE 1" if updated
         """
-        data: List[PlayerData] = await self.get_player_data(player_id)
-        if len(data) == 0:
-            cols: str = ", ".join(fields.keys())
-            vals: str = ", ".join([f"${i+2}" for i in range(len(fields))])
-            out: str = await self.database.execute(
-                f"insert into players (player_id, {cols}) values ($1, {vals})",
-                player_id,
-                *fields.values(),
-            )
-        else:
-            list_of_vals: list[str] = [
-                f"{v} = ${i+2}" for i, v in enumerate(fields.keys())
-            ]
-            vals = ", ".join(list_of_vals)
-            out: str = await self.database.execute(
-                f"update players set {vals} where player_id = $1",
-                player_id,
-                *fields.values(),
-            )
-        return out
+        return await self.upsert("players", "player_id", player_id, **fields)
+
+    async def update_players_pop_waitlist(
+        self,
+        players: List[PlayerData],
+        player_matches: Optional[List[PlayerMatchData]] = None,
+        match: Optional[MatchData] = None,
+    ) -> List[int]:
+        """updates data for all the players, saves the match and their stats
+        of the match, refreshes their leaderboard rows and removes them from
+        the waitlist in a single transaction
+
+        every player must have the same fields
+
+        parameters
+        ----------
+        players: List[PlayerData]
+            data of the players to update, including player_id
+        player_matches: Optional[List[PlayerMatchData]]
+            stats of the players in the match to save
+        match: Optional[MatchData]
+            the match to save
+
+        returns
+        -------
+        List[int]
+            discord ids of the players who were waiting for the players
+        """
+        if len(players) == 0:
+            return []
+        cols: List[str] = [col for col in players[0] if col != "player_id"]
+        player_ids: List[int] = [player["player_id"] for player in players]
+        async with self.database.acquire() as connection:
+            async with connection.transaction():
+                await connection.executemany(
+                    self.upsert_query("players", "player_id", cols),
+                    [
+                        (player["player_id"], *[player[col] for col in cols])
+                        for player in players
+                    ],
+                )
+                if match is not None:
+                    await self.save_match(match, connection)
+                await self.insert_player_matches(
+                    player_matches or [], connection
+                )
+                await self.refresh_leaderboard(player_ids, connection)
+                waitlists: List[WaitlistData] = await connection.fetch(
+                    "delete from waitlist where player_id = any($1::bigint[])"
+                    + " returning *",
+                    player_ids,
+                )
+        return [
+            waiter
+            for waitlist in waitlists
+            for waiter in waitlist["waiting_id"] or []
+        ]
+
+    async def save_match(
+        self,
+        match: MatchData,
+        connection: Optional[PoolConnectionProxy] = None,
+    ) -> None:
+        """saves the match, replacing it if already saved
+
+        parameters
+        ----------
+        match: MatchData
+            the match to save
+        connection: Optional[PoolConnectionProxy]
+            connection to use e.g. to save in a transaction, defaults to the
+            pool
+        """
+        await (connection or self.database).execute(
+            "insert into matches (match_id, game_end, data)"
+            + " values ($1, $2, $3::jsonb) on conflict (match_id)"
+            + " do update set game_end = excluded.game_end,"
+            + " data = excluded.data",
+            match["match_id"],
+            match["game_end"],
+            json.dumps(match["data"]),
+        )
+
+    async def get_match(self, match_id: str) -> Optional[MatchData]:
+        """returns the saved match
+
+        parameters
+        ----------
+        match_id: str
+            id of the match
+
+        returns
+        -------
+        Optional[MatchData]
+            the match if saved, None otherwise
+        """
+        row: Optional[Dict[str, Any]] = await self.database.fetchrow(
+            "select * from matches where match_id = $1", match_id
+        )
+        if row is None:
+            return None
+        return MatchData(
+            match_id=row["match_id"],
+            game_end=row["game_end"],
+            data=json.loads(row["data"]),
+        )
+
+    async def delete_matches_before(self, game_end: float) -> str:
+        """deletes the saved matches that ended before game_end
+
+        parameters
+        ----------
+        game_end: float
+            unix timestamp before which matches are deleted
+
+        returns
+        -------
+        str
+            output of the query
+        """
+        return await self.database.execute(
+            "delete from matches where game_end < $1", game_end
+        )
+
+    async def insert_player_matches(
+        self,
+        player_matches: List[PlayerMatchData],
+        connection: Optional[PoolConnectionProxy] = None,
+    ) -> None:
+        """saves the stats of players in matches, skipping the matches
+        already saved for the player
+
+        parameters
+        ----------
+        player_matches: List[PlayerMatchData]
+            stats of players in matches to save
+        connection: Optional[PoolConnectionProxy]
+            connection to use e.g. to save in a transaction, defaults to the
+            pool
+        """
+        if len(player_matches) == 0:
+            return
+        cols: str = ", ".join(PLAYER_MATCH_COLUMNS)
+        vals: str = ", ".join(
+            [f"${i+1}" for i in range(len(PLAYER_MATCH_COLUMNS))]
+        )
+        await (connection or self.database).executemany(
+            f"insert into player_matches ({cols}) values ({vals})"
+            + " on conflict (puuid, match_id) do nothing",
+            [
+                tuple(player_match[col] for col in PLAYER_MATCH_COLUMNS)
+                for player_match in player_matches
+            ],
+        )
+
+    async def get_player_matches(
+        self, puuid: str, limit: int
+    ) -> List[PlayerMatchData]:
+        """returns the most recent saved matches of the player
+
+        parameters
+        ----------
+        puuid: str
+            valorant puuid of the player
+        limit: int
+            maximum number of matches to return
+
+        returns
+        -------
+        List[PlayerMatchData]
+            stats of the player in the matches, newest first
+        """
+        return await self.database.fetch(
+            "select * from player_matches where puuid = $1"
+            + " order by game_end desc limit $2",
+            puuid,
+            limit,
+        )
+
+    async def refresh_leaderboard(
+        self,
+        player_ids: Optional[List[int]] = None,
+        connection: Optional[PoolConnectionProxy] = None,
+    ) -> None:
+        """recomputes the leaderboard rows of the players from their saved
+        matches of the last `LEADERBOARD_WINDOW` seconds
+
+        parameters
+        ----------
+        player_ids: Optional[List[int]]
+            discord ids of the players to refresh, all players if None
+        connection: Optional[PoolConnectionProxy]
+            connection to use e.g. to refresh in a transaction, defaults to
+            the pool
+        """
+        if player_ids is not None and len(player_ids) == 0:
+            return
+        await (connection or self.database).execute(
+            """insert into guild_leaderboard (player_id, guild_id, games, wins,
+            acs, headshot_rate, win_rate, streak, rank, updated_at)
+            select players.player_id, players.guild_id,
+            count(m.match_id), count(*) filter (where m.result = 1),
+            coalesce(avg(m.acs), 0),
+            coalesce(sum(m.headshots)::double precision / nullif(
+                sum(coalesce(m.headshots, 0) + coalesce(m.bodyshots, 0)
+                + coalesce(m.legshots, 0)), 0), 0),
+            coalesce(avg((m.result = 1)::integer), 0),
+            coalesce(players.streak, 0), players.rank, now()
+            from players left join player_matches m
+            on m.puuid = players.puuid and m.game_end >= $2
+            where $1::bigint[] is null or players.player_id = any($1)
+            group by players.player_id
+            on conflict (player_id) do update set
+            guild_id = excluded.guild_id, games = excluded.games,
+            wins = excluded.wins, acs = excluded.acs,
+            headshot_rate = excluded.headshot_rate,
+            win_rate = excluded.win_rate, streak = excluded.streak,
+            rank = excluded.rank, updated_at = excluded.updated_at""",
+            player_ids,
+            time.time() - LEADERBOARD_WINDOW,
+        )
+
+    async def get_leaderboard(
+        self, guild_id: int, order: str, limit: int = 10
+    ) -> List[LeaderboardData]:
+        """returns the top active players of the guild's leaderboard
+
+        parameters
+        ----------
+        guild_id: int
+            discord id of the guild
+        order: str
+            column to sort by, one of `LEADERBOARD_ORDERS`
+        limit: int
+            maximum number of players to return
+
+        returns
+        -------
+        List[LeaderboardData]
+            leaderboard rows, best first
+
+        raises
+        ------
+        ValueError
+            if order is not one of `LEADERBOARD_ORDERS`
+        """
+        if order not in LEADERBOARD_ORDERS:
+            raise ValueError(f"cannot sort leaderboard by {order}!")
+        return await self.database.fetch(
+            "select l.* from guild_leaderboard l join players p"
+            + " on p.player_id = l.player_id"
+            + " where l.guild_id = $1 and p.deactivated_at is null"
+            + f" order by l.{order} desc, l.games desc limit $2",
+            guild_id,
+            limit,
+        )
 
     async def get_waitlist_data(self, player_id: int) -> List[WaitlistData]:
         """returns data for specified waitlisted player from player_id
@@ -506,24 +1061,25 @@ class Database:
         returns
         -------
         str
-            output of the query
+            "INSERT 0 1" if the player was inserted, "UPDATE 1" if updated
         """
-        data: List[WaitlistData] = await self.database.fetch(
-            "select * from waitlist where player_id = $1", player_id
+        return await self.upsert(
+            "waitlist", "player_id", player_id, waiting_id=waiting_id
         )
-        if len(data) == 0:
-            out: str = await self.database.execute(
-                "insert into waitlist (player_id, waiting_id) values ($1, $2)",
-                player_id,
-                waiting_id,
-            )
-        else:
-            out: str = await self.database.execute(
-                "update waitlist set waiting_id = $2 where player_id = $1",
-                player_id,
-                waiting_id,
-            )
-        return out
+
+    async def get_waited_ids(self) -> List[int]:
+        """returns ids of all players someone is waiting for
+
+        returns
+        -------
+        List[int]
+            discord ids of the waitlisted players with at least one waiter
+        """
+        waitlists: List[WaitlistData] = await self.database.fetch(
+            "select player_id from waitlist"
+            + " where cardinality(waiting_id) > 0"
+        )
+        return [waitlist["player_id"] for waitlist in waitlists]
 
     async def get_player_join_waiters(
         self, player_id: int
@@ -4,7 +4,6 @@ import re
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Union
 
-import aiohttp
 import dateutil.parser as dp
 from disnake import (
     ApplicationCommandInteraction,
@@ -16,6 +15,7 @@ from disnake.ext import commands
 
 from helpers.db import GuildData, db
 from helpers.helpers import DiscordReturn, use_prefix
+from helpers.http_client import http_client
 from views.views import Menu, PageView, SelectEmbed
 
 HOLODEX_TOKEN: Optional[str] = os.environ.get("HOLODEX_TOKEN")
@@ -292,6 +292,17 @@ class Channel:
         for vid in videos:
             self.add_vid_to_embed(vid)
 
+    async def render_embed(self) -> Embed:
+        """adds the channel's videos to the embed
+
+        returns
+        -------
+        Embed
+            channel embed with a field for each video
+        """
+        self.add_vids_to_embed(self.videos)
+        return self.embed
+
     def clone(self) -> "Channel":
         """clone the channel with the same name, emoji, and color
 
@@ -456,15 +467,17 @@ async def fubudex(
             )
 
     for link, channel in focus_channels.items():
-        channel.add_vids_to_embed(channel.videos)
+        if any(video.status == "live" for video in channel.videos):
+            channel.live_status = "is live!"
         if channel.videos:
+            # the channel's embed is only rendered when its page is chosen
             embeds.append(
                 SelectEmbed(
                     name=channel.name,
                     description=channel.emoji,
                     emoji=channel.emoji,
                     color=channel.color,
-                    embed=channel.embed,
+                    factory=channel.render_embed,
                 )
             )
         url: str = f"https://www.youtube.com/channel/{link}"
@@ -531,13 +544,9 @@ async def holo(reply: Union[InteractionMessage, Message]) -> DiscordReturn:
         "Content-Type": "application/json",
         "X-APIKEY": HOLODEX_TOKEN,
     }
-    async with aiohttp.ClientSession() as session:
-        request: aiohttp.ClientResponse = await session.get(
-            url, headers=headers, params=params
-        )
-    if request.status != 200:
-        raise ConnectionError("error retrieving info! try again later")
-    data: Dict = await request.json()
+    data: Dict = await http_client.get_json(
+        url, headers=headers, params=params
+    )
     return await holodex(reply, data)
 
 
@@ -574,13 +583,9 @@ async def fubu(reply: Union[InteractionMessage, Message]) -> DiscordReturn:
         "Content-Type": "application/json",
         "X-APIKEY": HOLODEX_TOKEN,
     }
-    async with aiohttp.ClientSession() as session:
-        request: aiohttp.ClientResponse = await session.get(
-            url, headers=headers, params=params
-        )
-    if request.status != 200:
-        raise ConnectionError("error retrieving info! try again later")
-    data: Dict = await request.json()
+    data: Dict = await http_client.get_json(
+        url, headers=headers, params=params
+    )
     return await fubudex(reply, data)
 
 
@@ -0,0 +1,137 @@
+"""shared http client for requests to upstream apis"""
+import asyncio
+from typing import Any, Optional
+
+import aiohttp
+
+from helpers.json_backend import loads
+
+
+class HTTPClient:
+    """http client kept alive for the lifetime of the bot
+
+    all upstream requests share a single `aiohttp.ClientSession` so that
+    connections are pooled per host and kept alive between requests, and dns
+    lookups are cached instead of repeated for every request
+
+    attributes
+    ----------
+    limit: int
+        maximum number of open connections
+    limit_per_host: int
+        maximum number of open connections to the same host
+    dns_ttl: int
+        seconds to cache dns lookups for
+    keepalive: float
+        seconds to keep idle connections open for
+    timeout: float
+        seconds before a request is abandoned
+    session: aiohttp.ClientSession
+        the shared session, created on first use
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        dns_ttl: int = 300,
+        keepalive: float = 60,
+        timeout: float = 30,
+    ) -> None:
+        """initialises the client settings. the session is only created on
+        first use as it needs a running event loop
+
+        parameters
+        ----------
+        limit: int
+            maximum number of open connections
+        limit_per_host: int
+            maximum number of open connections to the same host
+        dns_ttl: int
+            seconds to cache dns lookups for
+        keepalive: float
+            seconds to keep idle connections open for
+        timeout: float
+            seconds before a request is abandoned
+        """
+        self.limit: int = limit
+        """maximum number of open connections"""
+        self.limit_per_host: int = limit_per_host
+        """maximum number of open connections to the same host"""
+        self.dns_ttl: int = dns_ttl
+        """seconds to cache dns lookups for"""
+        self.keepalive: float = keepalive
+        """seconds to keep idle connections open for"""
+        self.timeout: float = timeout
+        """seconds before a request is abandoned"""
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """the shared session, created on first use
+
+        returns
+        -------
+        aiohttp.ClientSession
+            session with pooled connections
+        """
+        if self._session is None or self._session.closed:
+            connector: aiohttp.TCPConnector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def get_json(self, url: str, **kwargs: Any) -> Any:
+        """sends a get request and returns the decoded json response
+
+        the response is decoded with the fastest available json backend, see
+        `helpers.json_backend`
+
+        parameters
+        ----------
+        url: str
+            url to send the request to
+        kwargs: Any
+            extra arguments passed to `aiohttp.ClientSession.get`
+            e.g. headers, params
+
+        returns
+        -------
+        Any
+            decoded json response
+
+        raises
+        ------
+        ConnectionError
+            if the request failed, timed out, the status is not 200 or the
+            response is not valid json
+        """
+        try:
+            async with self.session.get(url, **kwargs) as response:
+                if response.status != 200:
+                    raise ConnectionError(
+                        f"error retrieving {url}! status {response.status}"
+                    )
+                body: bytes = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            raise ConnectionError(f"error retrieving {url}! {err}") from err
+        try:
+            return loads(body)
+        except ValueError as err:
+            raise ConnectionError(f"invalid json from {url}! {err}") from err
+
+    async def close(self) -> None:
+        """closes the session and all pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+http_client = HTTPClient()
@@ -0,0 +1,37 @@
+"""json decoding backend for api responses
+
+orjson is used if it is installed as it decodes several times faster than
+the standard library, which is used otherwise
+"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+BACKEND: str = "orjson" if orjson is not None else "json"
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """decodes a json document with the fastest available backend
+
+    parameters
+    ----------
+    data: Union[bytes, str]
+        json document to decode
+
+    returns
+    -------
+    Any
+        decoded json document
+
+    raises
+    ------
+    ValueError
+        if the document is not valid json
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,386 @@
+"""versioned database schema migrations
+
+migrations are applied in order of version, each in its own transaction, and
+recorded in the schema_migrations table so they only run once. every
+migration must be idempotent as databases created before migrations were
+introduced already have some of the schema. add new migrations to the end of
+`MIGRATIONS` with the next version number and never edit applied ones
+"""
+from dataclasses import dataclass
+from typing import Any, List, Set
+
+from asyncpg import PostgresError
+from asyncpg.pool import Pool
+
+# key of the advisory lock held while migrating so concurrent processes do
+# not apply the same migration twice
+MIGRATIONS_LOCK = 0x4C414646
+
+
+@dataclass
+class Migration:
+    """a single schema change
+
+    parameters
+    ----------
+    version: int
+        order in which the migration is applied
+    description: str
+        short description of the change
+    sql: str
+        idempotent sql statements to apply
+    """
+
+    version: int
+    """order in which the migration is applied"""
+    description: str
+    """short description of the change"""
+    sql: str
+    """idempotent sql statements to apply"""
+
+
+def add_primary_key_sql(table: str, key: str, keep: str) -> str:
+    """sql to add a primary key to a table created without one
+
+    of the duplicate rows with the same key, the first row ordered by keep is
+    kept. the others are moved to the `<table>_removed_duplicates` table,
+    created only if there are duplicates, and a notice with their number is
+    raised
+
+    parameters
+    ----------
+    table: str
+        table to add the primary key to
+    key: str
+        column to use as the primary key
+    keep: str
+        sql ORDER BY expression choosing the row to keep, ties are broken by
+        the values of the whole row
+
+    returns
+    -------
+    str
+        idempotent sql adding the primary key
+    """
+    return f"""DO $$
+    DECLARE
+        removed integer;
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conrelid = 'public.{table}'::regclass AND contype = 'p'
+        ) THEN
+            IF EXISTS (
+                SELECT 1 FROM public.{table}
+                GROUP BY {key} HAVING count(*) > 1
+            ) THEN
+                CREATE TABLE IF NOT EXISTS public.{table}_removed_duplicates
+                (LIKE public.{table});
+                WITH ranked AS (
+                    SELECT ctid AS row_ctid, row_number() OVER (
+                        PARTITION BY {key}
+                        ORDER BY {keep}, to_jsonb({table})::text
+                    ) AS n
+                    FROM public.{table}
+                ), removed_rows AS (
+                    DELETE FROM public.{table} USING ranked
+                    WHERE {table}.ctid = ranked.row_ctid AND ranked.n > 1
+                    RETURNING {table}.*
+                )
+                INSERT INTO public.{table}_removed_duplicates
+                SELECT * FROM removed_rows;
+                GET DIAGNOSTICS removed = ROW_COUNT;
+                RAISE NOTICE
+                    'moved % duplicate rows to {table}_removed_duplicates',
+                    removed;
+            END IF;
+            ALTER TABLE public.{table}
+            ADD CONSTRAINT {table}_pkey PRIMARY KEY ({key});
+        END IF;
+    END $$;"""
+
+
+def print_notice(_connection: Any, message: Any) -> None:
+    """prints a notice raised while migrating
+
+    parameters
+    ----------
+    _connection: Any
+        connection the notice was raised on
+    message: Any
+        the notice, an `asyncpg.PostgresLogMessage`
+    """
+    print(f"migration notice: {message}")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        description="create guilds, players and waitlist tables",
+        sql="""CREATE TABLE IF NOT EXISTS public.guilds(
+        guild_id bigint NOT NULL,
+        prefix text COLLATE pg_catalog."default",
+        watch_channel bigint,
+        ping_role bigint,
+        ping_image text COLLATE pg_catalog."default",
+        feeder_messages text[] COLLATE pg_catalog."default",
+        feeder_images text[] COLLATE pg_catalog."default",
+        streaker_messages text[] COLLATE pg_catalog."default"
+        );
+        CREATE TABLE IF NOT EXISTS public.players(
+        player_id bigint NOT NULL,
+        guild_id bigint,
+        name text COLLATE pg_catalog."default",
+        tag text COLLATE pg_catalog."default",
+        region text COLLATE pg_catalog."default",
+        puuid text COLLATE pg_catalog."default",
+        lastTime double precision,
+        streak integer,
+        headshots integer[],
+        bodyshots integer[],
+        legshots integer[],
+        acs double precision[],
+        rank text COLLATE pg_catalog."default"
+        );
+        CREATE TABLE IF NOT EXISTS public.waitlist(
+        player_id bigint NOT NULL,
+        waiting_id bigint[]
+        );""",
+    ),
+    Migration(
+        version=2,
+        description="add primary keys to guilds, players and waitlist",
+        # keep the guild with a channel set, the player with the most recent
+        # match and the waitlist with the most waiters
+        sql=add_primary_key_sql(
+            "guilds", "guild_id", "watch_channel IS NULL, prefix IS NULL"
+        )
+        + add_primary_key_sql(
+            "players", "player_id", "lastTime DESC NULLS LAST"
+        )
+        + add_primary_key_sql(
+            "waitlist", "player_id", "cardinality(waiting_id) DESC NULLS LAST"
+        ),
+    ),
+    Migration(
+        version=3,
+        description="add unique index on active players.puuid",
+        # an account can only be watched by one discord user. of the users
+        # watching the same account, the one with the most recent match keeps
+        # it and the others are deactivated, keeping their data. adds the
+        # deactivated_at column of migration 9 early for this
+        sql="""ALTER TABLE public.players
+        ADD COLUMN IF NOT EXISTS deactivated_at timestamp with time zone;
+        DO $$
+        DECLARE
+            deactivated integer;
+        BEGIN
+            WITH ranked AS (
+                SELECT player_id, row_number() OVER (
+                    PARTITION BY puuid
+                    ORDER BY lastTime DESC NULLS LAST, player_id
+                ) AS n
+                FROM public.players
+                WHERE puuid IS NOT NULL AND deactivated_at IS NULL
+            )
+            UPDATE public.players SET deactivated_at = now()
+            FROM ranked
+            WHERE players.player_id = ranked.player_id AND ranked.n > 1;
+            GET DIAGNOSTICS deactivated = ROW_COUNT;
+            IF deactivated > 0 THEN
+                RAISE NOTICE
+                    'deactivated % players watching an account watched '
+                    'by another user', deactivated;
+            END IF;
+        END $$;
+        CREATE UNIQUE INDEX IF NOT EXISTS players_active_puuid_key
+        ON public.players (puuid) WHERE deactivated_at IS NULL;""",
+    ),
+    Migration(
+        version=4,
+        description="add index on players.guild_id",
+        sql="""CREATE INDEX IF NOT EXISTS players_guild_id_idx
+        ON public.players (guild_id);""",
+    ),
+    Migration(
+        version=5,
+        description="notify on changes to guilds and players",
+        # notifications are sent on the channel named after the table. the
+        # payload is a json object with the operation, the id of the changed
+        # row and the application_name of the connection that changed it
+        sql="""CREATE OR REPLACE FUNCTION public.notify_change()
+        RETURNS trigger AS $$
+        DECLARE
+            changed jsonb;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                changed := to_jsonb(OLD);
+            ELSE
+                changed := to_jsonb(NEW);
+            END IF;
+            PERFORM pg_notify(TG_TABLE_NAME, json_build_object(
+                'op', TG_OP,
+                'id', changed -> TG_ARGV[0],
+                'origin', current_setting('application_name')
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        DROP TRIGGER IF EXISTS guilds_notify ON public.guilds;
+        CREATE TRIGGER guilds_notify
+        AFTER INSERT OR UPDATE OR DELETE ON public.guilds
+        FOR EACH ROW EXECUTE PROCEDURE public.notify_change('guild_id');
+        DROP TRIGGER IF EXISTS players_notify ON public.players;
+        CREATE TRIGGER players_notify
+        AFTER INSERT OR UPDATE OR DELETE ON public.players
+        FOR EACH ROW EXECUTE PROCEDURE public.notify_change('player_id');""",
+    ),
+    Migration(
+        version=6,
+        description="create player_matches table",
+        sql="""CREATE TABLE IF NOT EXISTS public.player_matches(
+        puuid text COLLATE pg_catalog."default" NOT NULL,
+        match_id text COLLATE pg_catalog."default" NOT NULL,
+        guild_id bigint,
+        game_end double precision NOT NULL,
+        mode text COLLATE pg_catalog."default",
+        map text COLLATE pg_catalog."default",
+        agent text COLLATE pg_catalog."default",
+        kills integer,
+        deaths integer,
+        assists integer,
+        score integer,
+        acs double precision,
+        headshots integer,
+        bodyshots integer,
+        legshots integer,
+        result smallint,
+        rank text COLLATE pg_catalog."default",
+        CONSTRAINT player_matches_pkey PRIMARY KEY (puuid, match_id)
+        );
+        CREATE INDEX IF NOT EXISTS player_matches_puuid_game_end_idx
+        ON public.player_matches (puuid, game_end DESC);
+        CREATE INDEX IF NOT EXISTS player_matches_guild_id_game_end_idx
+        ON public.player_matches (guild_id, game_end DESC);""",
+    ),
+    Migration(
+        version=7,
+        description="create guild_leaderboard table",
+        # one row per watched player, refreshed from player_matches whenever
+        # the player's matches are saved
+        sql="""CREATE TABLE IF NOT EXISTS public.guild_leaderboard(
+        player_id bigint NOT NULL PRIMARY KEY
+            REFERENCES public.players (player_id) ON DELETE CASCADE,
+        guild_id bigint,
+        games integer NOT NULL DEFAULT 0,
+        wins integer NOT NULL DEFAULT 0,
+        acs double precision NOT NULL DEFAULT 0,
+        headshot_rate double precision NOT NULL DEFAULT 0,
+        win_rate double precision NOT NULL DEFAULT 0,
+        streak integer NOT NULL DEFAULT 0,
+        rank text COLLATE pg_catalog."default",
+        updated_at timestamp with time zone NOT NULL DEFAULT now()
+        );
+        CREATE INDEX IF NOT EXISTS guild_leaderboard_guild_id_idx
+        ON public.guild_leaderboard (guild_id);""",
+    ),
+    Migration(
+        version=8,
+        description="create matches table",
+        # matches that were alerted, kept so alert buttons can re-render
+        # their pages after the match has left the cache or a restart
+        sql="""CREATE TABLE IF NOT EXISTS public.matches(
+        match_id text COLLATE pg_catalog."default" NOT NULL PRIMARY KEY,
+        game_end double precision NOT NULL,
+        data jsonb NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS matches_game_end_idx
+        ON public.matches (game_end);""",
+    ),
+    Migration(
+        version=9,
+        description="add players.deactivated_at",
+        # players whose discord user no longer exists are deactivated rather
+        # than deleted, and reactivated when saved again
+        sql="""ALTER TABLE public.players
+        ADD COLUMN IF NOT EXISTS deactivated_at timestamp with time zone;""",
+    ),
+    Migration(
+        version=10,
+        description="make players.puuid unique among active players only",
+        # databases that applied the first version of migration 3 have a
+        # unique index on all players, so an account of a deactivated player
+        # could not be watched by another user
+        sql="""DROP INDEX IF EXISTS public.players_puuid_key;
+        CREATE UNIQUE INDEX IF NOT EXISTS players_active_puuid_key
+        ON public.players (puuid) WHERE deactivated_at IS NULL;""",
+    ),
+]
+
+
+async def migrate(pool: Pool) -> List[int]:
+    """applies all migrations that have not been applied yet
+
+    parameters
+    ----------
+    pool: asyncpg.pool.Pool
+        database pool to migrate
+
+    returns
+    -------
+    List[int]
+        versions of the migrations applied
+
+    raises
+    ------
+    ConnectionError
+        if a migration failed, the migrations before it stay applied
+    """
+    applied_now: List[int] = []
+    async with pool.acquire() as connection:
+        await connection.execute(
+            """CREATE TABLE IF NOT EXISTS public.schema_migrations(
+            version integer NOT NULL PRIMARY KEY,
+            description text,
+            applied_at timestamp with time zone NOT NULL DEFAULT now()
+            )"""
+        )
+        await connection.execute(
+            "select pg_advisory_lock($1)", MIGRATIONS_LOCK
+        )
+        connection.add_log_listener(print_notice)
+        try:
+            applied: Set[int] = {
+                row["version"]
+                for row in await connection.fetch(
+                    "select version from schema_migrations"
+                )
+            }
+            for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+                if migration.version in applied:
+                    continue
+                try:
+                    async with connection.transaction():
+                        await connection.execute(migration.sql)
+                        await connection.execute(
+                            "insert into schema_migrations"
+                            + " (version, description) values ($1, $2)",
+                            migration.version,
+                            migration.description,
+                        )
+                except PostgresError as err:
+                    raise ConnectionError(
+                        f"could not apply migration {migration.version}:"
+                        + f" {err}"
+                    ) from err
+                print(
+                    f"applied migration {migration.version}:"
+                    + f" {migration.description}"
+                )
+                applied_now.append(migration.version)
+        finally:
+            await connection.execute(
+                "select pg_advisory_unlock($1)", MIGRATIONS_LOCK
+            )
+            connection.remove_log_listener(print_notice)
+    return applied_now
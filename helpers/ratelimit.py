@@ -0,0 +1,119 @@
+"""rate limiting helpers for upstream apis"""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """token bucket rate limiter shared between concurrent requests
+
+    tokens are refilled continuously at `rate` tokens per second up to
+    `capacity`. each request takes one token, waiting for a refill if the
+    bucket is empty
+
+    attributes
+    ----------
+    rate: float
+        number of tokens refilled per second
+    capacity: float
+        maximum number of tokens the bucket can hold
+    tokens: float
+        number of tokens currently available
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """initialises a full bucket with the given rate and capacity
+
+        parameters
+        ----------
+        rate: float
+            number of tokens refilled per second
+        capacity: float
+            maximum number of tokens the bucket can hold
+
+        raises
+        ------
+        ValueError
+            if rate or capacity is not positive
+        """
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive!")
+        self.rate: float = rate
+        """number of tokens refilled per second"""
+        self.capacity: float = capacity
+        """maximum number of tokens the bucket can hold"""
+        self.tokens: float = capacity
+        """number of tokens currently available"""
+        self._updated: float = time.monotonic()
+        self._lock: asyncio.Lock = asyncio.Lock()
+
+    @classmethod
+    def per_period(
+        cls, requests: float, period: float, burst: float = 1
+    ) -> "TokenBucket":
+        """creates a bucket allowing at most `requests` requests in any
+        window of `period` seconds
+
+        the bucket holds `burst` tokens and refills the rest of the budget
+        over the period, so even a full bucket cannot go over the limit
+
+        parameters
+        ----------
+        requests: float
+            maximum number of requests in any window of `period` seconds
+        period: float
+            length of the window in seconds
+        burst: float
+            number of requests that can be sent at once
+
+        returns
+        -------
+        TokenBucket
+            bucket with capacity `burst` refilling at
+            `(requests - burst) / period` per second
+
+        raises
+        ------
+        ValueError
+            if requests is not more than burst
+        """
+        if requests <= burst:
+            raise ValueError("requests must be more than burst!")
+        return cls(rate=(requests - burst) / period, capacity=burst)
+
+    @classmethod
+    def per_minute(cls, requests: float, burst: float = 1) -> "TokenBucket":
+        """creates a bucket allowing at most `requests` requests in any
+        minute, see `per_period`
+
+        parameters
+        ----------
+        requests: float
+            maximum number of requests in any minute
+        burst: float
+            number of requests that can be sent at once
+
+        returns
+        -------
+        TokenBucket
+            bucket allowing `requests` requests per minute
+        """
+        return cls.per_period(requests, 60, burst)
+
+    def _refill(self) -> None:
+        """adds the tokens accumulated since the last refill"""
+        now: float = time.monotonic()
+        elapsed: float = now - self._updated
+        self._updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+
+    async def acquire(self) -> None:
+        """takes a token from the bucket, waiting until one is available
+
+        waiters are served in the order they called `acquire`
+        """
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
@@ -0,0 +1,132 @@
+"""fixed-size buffers of the most recent values"""
+from array import array
+from typing import Iterable, Iterator, List, Optional, Union
+
+Number = Union[int, float]
+
+
+class RingBuffer:
+    """fixed-capacity buffer keeping the last `capacity` values appended
+
+    values are stored in a preallocated array and the sum and count of the
+    values that are not None are kept up to date, so appending and averaging
+    are O(1) and do not allocate
+
+    attributes
+    ----------
+    capacity: int
+        maximum number of values kept
+    total: Union[int, float]
+        sum of the values kept, ignoring None values
+    count: int
+        number of values kept that are not None
+    """
+
+    __slots__ = (
+        "capacity",
+        "total",
+        "count",
+        "_values",
+        "_present",
+        "_start",
+        "_len",
+    )
+
+    def __init__(
+        self,
+        capacity: int,
+        values: Iterable[Optional[Number]] = (),
+        typecode: str = "d",
+    ) -> None:
+        """initialises the buffer with the last `capacity` values
+
+        parameters
+        ----------
+        capacity: int
+            maximum number of values kept
+        values: Iterable[Optional[Union[int, float]]]
+            initial values, oldest first
+        typecode: str
+            `array.array` typecode of the values e.g. "q" for integers, "d"
+            for floats
+
+        raises
+        ------
+        ValueError
+            if capacity is not positive
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be positive!")
+        self.capacity: int = capacity
+        """maximum number of values kept"""
+        self.total: Number = 0
+        """sum of the values kept, ignoring None values"""
+        self.count: int = 0
+        """number of values kept that are not None"""
+        self._values: array = array(typecode, [0]) * capacity
+        # 1 if the value at the same index is not None
+        self._present: bytearray = bytearray(capacity)
+        self._start: int = 0
+        self._len: int = 0
+        self.extend(values)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Optional[Number]]:
+        for i in range(self._len):
+            index: int = (self._start + i) % self.capacity
+            yield self._values[index] if self._present[index] else None
+
+    def append(self, value: Optional[Number]) -> None:
+        """appends a value, dropping the oldest value if full
+
+        parameters
+        ----------
+        value: Optional[Union[int, float]]
+            value to append, None if unknown
+        """
+        if self._len == self.capacity:
+            if self._present[self._start]:
+                self.total -= self._values[self._start]
+                self.count -= 1
+            index: int = self._start
+            self._start = (self._start + 1) % self.capacity
+        else:
+            index = (self._start + self._len) % self.capacity
+            self._len += 1
+        if value is None:
+            self._present[index] = 0
+            return
+        self._values[index] = value
+        self._present[index] = 1
+        self.total += self._values[index]
+        self.count += 1
+
+    def extend(self, values: Iterable[Optional[Number]]) -> None:
+        """appends each value in order
+
+        parameters
+        ----------
+        values: Iterable[Optional[Union[int, float]]]
+            values to append, oldest first
+        """
+        for value in values:
+            self.append(value)
+
+    def clear(self) -> None:
+        """removes all values"""
+        self.total = 0
+        self.count = 0
+        self._start = 0
+        self._len = 0
+
+    def to_list(self) -> List[Optional[Number]]:
+        """returns the values kept, oldest first
+
+        returns
+        -------
+        List[Optional[Union[int, float]]]
+            values kept, None for unknown values
+        """
+        return list(self)
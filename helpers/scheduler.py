@@ -0,0 +1,218 @@
+"""scheduling of when watched players are polled for new matches"""
+import heapq
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+WATCH_MIN_INTERVAL: float = float(os.environ.get("WATCH_MIN_INTERVAL", 60))
+WATCH_MAX_INTERVAL: float = float(
+    os.environ.get("WATCH_MAX_INTERVAL", 60 * 30)
+)
+
+
+class WatchScheduler:
+    """priority queue of players keyed on when they are next due to be polled
+
+    players who just played are likely still in a session and are polled
+    every `min_interval` seconds. the interval doubles for every `backoff`
+    seconds since their last match, up to `max_interval`, so inactive players
+    use little of the api budget. players someone is waiting for are polled
+    first and every `min_interval` seconds until their next match
+
+    attributes
+    ----------
+    min_interval: float
+        seconds between polls of a player who just played
+    max_interval: float
+        maximum seconds between polls of an inactive player
+    backoff: float
+        seconds since the last match after which the interval doubles
+    waited: Set[int]
+        discord ids of the players someone is waiting for
+    """
+
+    def __init__(
+        self,
+        min_interval: float = WATCH_MIN_INTERVAL,
+        max_interval: float = WATCH_MAX_INTERVAL,
+        backoff: float = 60 * 60,
+    ) -> None:
+        """initialises an empty scheduler
+
+        parameters
+        ----------
+        min_interval: float
+            seconds between polls of a player who just played
+        max_interval: float
+            maximum seconds between polls of an inactive player
+        backoff: float
+            seconds since the last match after which the interval doubles
+        """
+        self.min_interval: float = min_interval
+        """seconds between polls of a player who just played"""
+        self.max_interval: float = max(min_interval, max_interval)
+        """maximum seconds between polls of an inactive player"""
+        self.backoff: float = backoff
+        """seconds since the last match after which the interval doubles"""
+        self.waited: Set[int] = set()
+        """discord ids of the players someone is waiting for"""
+        # entries whose due time no longer matches `_due` are stale and
+        # skipped when popped
+        self._heap: List[Tuple[float, int]] = []
+        self._due: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, player_id: int) -> bool:
+        return player_id in self._due
+
+    def interval(self, lasttime: float, now: Optional[float] = None) -> float:
+        """returns the seconds to wait before polling a player again
+
+        parameters
+        ----------
+        lasttime: float
+            unix timestamp of the end of the player's last match
+        now: Optional[float]
+            current unix timestamp, defaults to `time.time()`
+
+        returns
+        -------
+        float
+            seconds between `min_interval` and `max_interval`
+        """
+        if now is None:
+            now = time.time()
+        idle: float = max(0, now - lasttime)
+        # cap the exponent, the interval is capped anyway
+        doublings: int = min(int(idle // self.backoff), 32)
+        return min(self.max_interval, self.min_interval * 2**doublings)
+
+    def schedule(self, player_id: int, due: float) -> None:
+        """sets when the player is next due, replacing any previous time
+
+        parameters
+        ----------
+        player_id: int
+            discord id of the player
+        due: float
+            unix timestamp of when the player is due
+        """
+        self._due[player_id] = due
+        heapq.heappush(self._heap, (due, player_id))
+
+    def reschedule(self, player_id: int, lasttime: float) -> None:
+        """schedules the next poll of a player that was just polled
+
+        parameters
+        ----------
+        player_id: int
+            discord id of the player
+        lasttime: float
+            unix timestamp of the end of the player's last match
+        """
+        now: float = time.time()
+        if player_id in self.waited:
+            self.schedule(player_id, now + self.min_interval)
+        else:
+            self.schedule(player_id, now + self.interval(lasttime, now))
+
+    def wait(self, player_id: int) -> None:
+        """marks the player as waited for and polls them as soon as possible
+
+        parameters
+        ----------
+        player_id: int
+            discord id of the player someone is waiting for
+        """
+        self.waited.add(player_id)
+        if player_id in self._due:
+            self.schedule(player_id, min(self._due[player_id], time.time()))
+
+    def unwait(self, player_ids: Iterable[int]) -> None:
+        """marks the players as no longer waited for, once their waiters
+        have been pinged
+
+        parameters
+        ----------
+        player_ids: Iterable[int]
+            discord ids of the players
+        """
+        self.waited.difference_update(player_ids)
+
+    def set_waited(self, player_ids: Iterable[int]) -> None:
+        """replaces the players someone is waiting for, e.g. with the
+        waitlist in the database so waits handled by other processes are
+        seen. players newly waited for are polled as soon as possible
+
+        parameters
+        ----------
+        player_ids: Iterable[int]
+            discord ids of all players someone is waiting for
+        """
+        waited: Set[int] = set(player_ids)
+        for player_id in waited - self.waited:
+            self.wait(player_id)
+        self.waited.intersection_update(waited)
+
+    def remove(self, player_id: int) -> None:
+        """stops scheduling the player
+
+        parameters
+        ----------
+        player_id: int
+            discord id of the player
+        """
+        self._due.pop(player_id, None)
+        self.waited.discard(player_id)
+
+    def sync(self, player_ids: Iterable[int]) -> None:
+        """schedules new players to be polled now and removes players that
+        are no longer watched
+
+        parameters
+        ----------
+        player_ids: Iterable[int]
+            discord ids of all watched players
+        """
+        watched: Dict[int, None] = dict.fromkeys(player_ids)
+        for player_id in list(self._due):
+            if player_id not in watched:
+                self.remove(player_id)
+        now: float = time.time()
+        for player_id in watched:
+            if player_id not in self._due:
+                self.schedule(player_id, now)
+
+    def pop_due(self, now: Optional[float] = None) -> List[int]:
+        """removes and returns all players that are due, players someone is
+        waiting for first, then earliest first
+
+        popped players are no longer scheduled until they are rescheduled
+
+        parameters
+        ----------
+        now: Optional[float]
+            current unix timestamp, defaults to `time.time()`
+
+        returns
+        -------
+        List[int]
+            discord ids of the due players
+        """
+        if now is None:
+            now = time.time()
+        due: List[int] = []
+        while self._heap and self._heap[0][0] <= now:
+            due_time, player_id = heapq.heappop(self._heap)
+            if self._due.get(player_id) != due_time:
+                continue
+            del self._due[player_id]
+            due.append(player_id)
+        # stable sort keeps the rest in order of due time
+        due.sort(key=lambda player_id: player_id not in self.waited)
+        return due
+
+
+watch_scheduler = WatchScheduler()
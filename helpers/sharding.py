@@ -0,0 +1,104 @@
+"""split of the valorant watch workload between gateway shards and replicas"""
+import zlib
+from typing import Iterable, Optional, Set
+
+from helpers.db import db
+
+# first key of the advisory locks on watch shards, the second is the shard id
+WATCH_SHARD_LOCK = 0x4C415753
+
+
+def shard_of(guild_id: Optional[int], puuid: str, shard_count: int) -> int:
+    """returns the shard whose replica watches a player
+
+    players in a guild are watched on the gateway shard of their guild, so
+    the guild is in the replica's cache and guildmates are watched together.
+    players without a guild are spread over the shards by a hash of their
+    puuid
+
+    parameters
+    ----------
+    guild_id: Optional[int]
+        discord id of the player's guild, 0 or None if they have none
+    puuid: str
+        puuid of the player
+    shard_count: int
+        total number of gateway shards
+
+    returns
+    -------
+    int
+        shard id between 0 and shard_count - 1
+    """
+    if shard_count <= 1:
+        return 0
+    if guild_id:
+        # https://discord.com/developers/docs/topics/gateway#sharding
+        return (guild_id >> 22) % shard_count
+    return zlib.crc32(puuid.encode()) % shard_count
+
+
+class WatchShards:
+    """shards whose players are watched by this replica
+
+    a replica can only watch the shards it is connected to, and only one
+    replica watches each shard at a time: watching a shard takes a postgres
+    advisory lock on it, held by a dedicated connection. replicas must be
+    given disjoint `SHARD_IDS`, as replicas connected to the same shard would
+    both answer its commands. the lock only guarantees a misconfigured shard
+    is not watched twice
+
+    attributes
+    ----------
+    shard_count: int
+        total number of gateway shards
+    owned: Set[int]
+        ids of the shards whose lock this replica holds
+    """
+
+    def __init__(self) -> None:
+        """initialises the shards with a single unowned shard"""
+        self.shard_count: int = 1
+        """total number of gateway shards"""
+        self.owned: Set[int] = set()
+        """ids of the shards whose lock this replica holds"""
+
+    async def acquire(
+        self, shard_count: int, shard_ids: Iterable[int]
+    ) -> None:
+        """tries to lock the shards this replica is connected to that it
+        does not own yet
+
+        parameters
+        ----------
+        shard_count: int
+            total number of gateway shards
+        shard_ids: Iterable[int]
+            ids of the shards this replica is connected to
+        """
+        self.shard_count = shard_count
+        for shard_id in shard_ids:
+            if shard_id in self.owned:
+                continue
+            if await db.try_advisory_lock(WATCH_SHARD_LOCK, shard_id):
+                self.owned.add(shard_id)
+
+    def owns(self, guild_id: Optional[int], puuid: str) -> bool:
+        """checks if this replica watches the player
+
+        parameters
+        ----------
+        guild_id: Optional[int]
+            discord id of the player's guild, 0 or None if they have none
+        puuid: str
+            puuid of the player
+
+        returns
+        -------
+        bool
+            True if the player's shard is owned by this replica
+        """
+        return shard_of(guild_id, puuid, self.shard_count) in self.owned
+
+
+watch_shards = WatchShards()
@@ -1,6 +1,7 @@
 """helper functions for valorant cog"""
 from typing import List, Optional, Union
 
+from asyncpg import UniqueViolationError
 from disnake import (
     ApplicationCommandInteraction,
     Embed,
@@ -19,9 +20,19 @@ from disnake import (
 )
 from disnake.ext import commands
 
-from helpers.db import GuildData, PlayerData, PlayerWaitlistData, db
+from helpers.db import (
+    LEADERBOARD_ORDERS,
+    GuildData,
+    LeaderboardData,
+    PlayerData,
+    PlayerMatchData,
+    PlayerWaitlistData,
+    db,
+)
+from helpers.channel_cache import alert_channels
 from helpers.helpers import DiscordReturn, use_prefix, validate_url
-from helpers.valorant_classes import Player
+from helpers.scheduler import watch_scheduler
+from helpers.valorant_classes import Player, roster
 from views.views import DeleterView, Menu
 
 
@@ -212,8 +223,12 @@ async def info(
     player: Player = Player(player_data[0])
     await player.update_name_tag()
     await player.update_db()
+    # the player saved is the roster's, so the stats of the saved matches
+    # are only loaded onto a copy to not overwrite the roster's stats
+    shown: Player = Player(player.to_data(), card=player.card)
+    await shown.load_match_stats()
     return {
-        "embed": player.info_embed().set_thumbnail(url=user.display_avatar.url)
+        "embed": shown.info_embed().set_thumbnail(url=user.display_avatar.url)
     }
 
 
@@ -258,8 +273,15 @@ async def watch(
         {"player_id": user_id, "guild_id": guild_id, "name": name, "tag": tag},
     )
     await player.update_puuid_region()
-    player.process_matches(await player.get_match_history())
-    result: str = await player.update_db()
+    player_matches: List[PlayerMatchData] = player.process_matches(
+        await player.get_match_history()
+    )
+    try:
+        result: str = await player.update_db()
+    except UniqueViolationError:
+        return {"content": f"`{player}` is already watched by another user!"}
+    await db.insert_player_matches(player_matches)
+    await db.refresh_leaderboard([user_id])
     if result.startswith("INSERT"):
         content: str = "user added to database."
     elif result.startswith("UPDATE"):
@@ -289,6 +311,7 @@ async def unwatch(
     user_data: List[PlayerData] = await db.get_player_data(user_id)
     if len(user_data):
         await db.delete_player_data(user_id)
+        roster.remove(user_id)
         content: str = (
             "user removed from database."
             + f" add again using {use_prefix(message)}valorant-watch!"
@@ -348,6 +371,7 @@ async def wait(
             await db.update_waitlist_data(
                 wait_user_id, current_waiters + [message_user_id]
             )
+            watch_scheduler.wait(wait_user_id)
             success_waiting.append(str(wait_user_id))
         else:
             non_db.append(str(wait_user_id))
@@ -433,6 +457,61 @@ async def waitlist(
     return {"embed": embed}
 
 
+async def leaderboard(
+    message: Union[ApplicationCommandInteraction, commands.Context],
+    sort: str = "acs",
+) -> DiscordReturn:
+    """shows the guild's watched players ranked by their recent matches
+
+    parameters
+    ----------
+    message: Union[ApplicationCommandInteraction, commands.Context]
+        interaction instance to respond to
+    sort: str
+        stat to rank by, one of `helpers.db.LEADERBOARD_ORDERS`
+        (default: acs)
+
+    returns
+    -------
+    DiscordReturn
+        content: str
+            error message if not sent in a guild or sort is invalid
+        embed: disnake.Embed
+            embed containing the guild's leaderboard
+    """
+    guild: Optional[Guild] = message.guild
+    if guild is None:
+        return {"content": "error! guild not found!"}
+    if sort not in LEADERBOARD_ORDERS:
+        return {
+            "content": f"use {use_prefix(message)}valorant-leaderboard"
+            + f" <{' | '.join(LEADERBOARD_ORDERS)}>"
+        }
+    rows: List[LeaderboardData] = await db.get_leaderboard(guild.id, sort)
+    embed: Embed = Embed(
+        title="valorant leaderboard",
+        description=f"top players of `{guild}` by {sort.replace('_', ' ')}",
+        color=0x3737E1,
+    )
+    for position, row in enumerate(rows, start=1):
+        streak: str = ""
+        if row["streak"]:
+            streak = f"  |  {abs(row['streak'])}" + (
+                "W" if row["streak"] > 0 else "L"
+            )
+        embed.add_field(
+            name=f"{position}. {row['rank'] or 'Unranked'}",
+            value=f"<@{row['player_id']}>  |  {int(row['acs'])} ACS"
+            + f"  |  {row['headshot_rate']:.0%} HS"
+            + f"  |  {row['win_rate']:.0%} WR ({row['games']} games)"
+            + streak,
+            inline=False,
+        )
+    if len(rows) == 0:
+        embed.description = "no watched players in this server yet!"
+    return {"embed": embed}
+
+
 async def set_channel(
     message: Union[ApplicationCommandInteraction, commands.Context],
     _channel: Optional[Union[TextChannel, VoiceChannel, Thread]] = None,
@@ -464,6 +543,7 @@ async def set_channel(
     result: str = await db.update_guild_data(
         guild.id, watch_channel=channel_id
     )
+    alert_channels.invalidate(guild.id)
     if result.startswith("INSERT"):
         content: str = (
             f"successfully set channel <#{channel_id}> for `{guild}`"
@@ -0,0 +1,273 @@
+"""indexes of valorant assets (maps, agents, ranks) and agent emojis"""
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional
+
+from disnake import Emoji
+
+from helpers.http_client import http_client
+
+ASSETS_API = "https://valorant-api.com/v1"
+VALORANT_ASSETS_PATH: str = os.environ.get(
+    "VALORANT_ASSETS_PATH", "valorant_assets.json"
+)
+
+
+def normalize(name: str) -> str:
+    """normalizes a display name to use as a lookup key
+
+    e.g. "KAY/O" -> "kayo", "Gold 1" -> "gold1"
+
+    parameters
+    ----------
+    name: str
+        display name to normalize
+
+    returns
+    -------
+    str
+        lowercase name with only letters and digits
+    """
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+class AssetIndex:
+    """index of valorant asset urls by display name
+
+    loaded once from the snapshot on disk, or from valorant-api if the
+    snapshot is missing or older than the ttl, and saved back to disk after
+    every refresh so restarts are warm
+
+    attributes
+    ----------
+    path: str
+        path of the snapshot file
+    ttl: float
+        seconds before the index is refreshed from the api
+    updated: float
+        unix timestamp of when the index was last refreshed from the api
+    maps: Dict[str, str]
+        map splash url by normalized map name
+    agents: Dict[str, str]
+        agent icon url by normalized agent name
+    ranks: Dict[str, str]
+        rank icon url by normalized rank name
+    """
+
+    def __init__(self, path: str, ttl: float = 60 * 60 * 24) -> None:
+        """initialises an empty index
+
+        parameters
+        ----------
+        path: str
+            path of the snapshot file
+        ttl: float
+            seconds before the index is refreshed from the api
+        """
+        self.path: str = path
+        """path of the snapshot file"""
+        self.ttl: float = ttl
+        """seconds before the index is refreshed from the api"""
+        self.updated: float = 0
+        """unix timestamp of when the index was last refreshed from the api"""
+        self.maps: Dict[str, str] = {}
+        """map splash url by normalized map name"""
+        self.agents: Dict[str, str] = {}
+        """agent icon url by normalized agent name"""
+        self.ranks: Dict[str, str] = {}
+        """rank icon url by normalized rank name"""
+        self._lock: asyncio.Lock = asyncio.Lock()
+
+    @property
+    def stale(self) -> bool:
+        """whether the index is older than the ttl
+
+        returns
+        -------
+        bool
+            True if the index should be refreshed
+        """
+        return time.time() - self.updated > self.ttl
+
+    def load_snapshot(self) -> None:
+        """loads the index from the snapshot file if it exists"""
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                snapshot: Dict = json.load(file)
+        except (OSError, ValueError):
+            return
+        self.updated = snapshot.get("updated", 0)
+        self.maps = snapshot.get("maps", {})
+        self.agents = snapshot.get("agents", {})
+        self.ranks = snapshot.get("ranks", {})
+
+    def save_snapshot(self) -> None:
+        """saves the index to the snapshot file"""
+        snapshot: Dict = {
+            "updated": self.updated,
+            "maps": self.maps,
+            "agents": self.agents,
+            "ranks": self.ranks,
+        }
+        tmp_path: str = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(snapshot, file)
+            os.replace(tmp_path, self.path)
+        except OSError as err:
+            print("could not save valorant assets: ", err)
+
+    async def refresh(self) -> None:
+        """refreshes the index from valorant-api and saves the snapshot
+
+        raises
+        ------
+        ConnectionError
+            if error retrieving assets
+        """
+        maps_json: Dict = await http_client.get_json(f"{ASSETS_API}/maps")
+        agents_json: Dict = await http_client.get_json(
+            f"{ASSETS_API}/agents", params={"isPlayableCharacter": "true"}
+        )
+        tiers_json: Dict = await http_client.get_json(
+            f"{ASSETS_API}/competitivetiers"
+        )
+        maps: Dict[str, str] = {
+            normalize(map_info.get("displayName", "")): map_info["splash"]
+            for map_info in maps_json.get("data") or []
+            if map_info.get("splash")
+        }
+        agents: Dict[str, str] = {
+            normalize(agent.get("displayName", "")): agent["displayIconSmall"]
+            for agent in agents_json.get("data") or []
+            if agent.get("displayIconSmall")
+        }
+        # the last episode has the current rank icons
+        episodes: List[Dict] = tiers_json.get("data") or [{}]
+        ranks: Dict[str, str] = {
+            normalize(tier.get("tierName", "")): tier["smallIcon"]
+            for tier in episodes[-1].get("tiers") or []
+            if tier.get("smallIcon")
+        }
+        self.maps, self.agents, self.ranks = maps, agents, ranks
+        self.updated = time.time()
+        self.save_snapshot()
+
+    async def load(self) -> None:
+        """loads the index from the snapshot, refreshing it from the api if
+        it is stale. if the api cannot be reached, the stale index is kept
+        """
+        async with self._lock:
+            if not self.updated:
+                self.load_snapshot()
+            if not self.stale:
+                return
+            try:
+                await self.refresh()
+            except ConnectionError as err:
+                print("could not refresh valorant assets: ", err)
+
+    def map_splash(self, name: str) -> str:
+        """returns the splash url of the map
+
+        parameters
+        ----------
+        name: str
+            display name of the map
+
+        returns
+        -------
+        str
+            splash url if map is found, empty string otherwise
+        """
+        return self.maps.get(normalize(name), "")
+
+    def agent_icon(self, name: str) -> str:
+        """returns the icon url of the agent
+
+        parameters
+        ----------
+        name: str
+            display name of the agent
+
+        returns
+        -------
+        str
+            icon url if agent is found, empty string otherwise
+        """
+        return self.agents.get(normalize(name), "")
+
+    def rank_icon(self, name: str) -> str:
+        """returns the icon url of the rank
+
+        parameters
+        ----------
+        name: str
+            name of the rank e.g. "Gold 1"
+
+        returns
+        -------
+        str
+            icon url if rank is found, empty string otherwise
+        """
+        return self.ranks.get(normalize(name), "")
+
+
+class EmojiIndex:
+    """index of the bot's custom emojis by agent name
+
+    built from every emoji the bot can use when the bot is ready and rebuilt
+    whenever the bot's emojis change, so looking up an agent's emoji does not
+    scan all the emojis
+
+    attributes
+    ----------
+    built: bool
+        whether the index has been built
+    emojis: Dict[str, Emoji]
+        first emoji with each name
+    """
+
+    def __init__(self) -> None:
+        """initialises an empty index"""
+        self.built: bool = False
+        """whether the index has been built"""
+        self.emojis: Dict[str, Emoji] = {}
+        """first emoji with each name"""
+
+    def build(self, emojis: Iterable[Emoji]) -> None:
+        """rebuilds the index from the emojis
+
+        parameters
+        ----------
+        emojis: Iterable[Emoji]
+            all emojis the bot can use
+        """
+        index: Dict[str, Emoji] = {}
+        for emoji in emojis:
+            index.setdefault(emoji.name, emoji)
+        self.emojis = index
+        self.built = True
+
+    def get(self, agent: str) -> Optional[Emoji]:
+        """returns the emoji named after the agent, ignoring any characters
+        that are not letters or digits e.g. "KAY/O" -> "KAYO"
+
+        parameters
+        ----------
+        agent: str
+            display name of the agent
+
+        returns
+        -------
+        Optional[Emoji]
+            emoji if found, None otherwise
+        """
+        return self.emojis.get(re.sub(r"[^a-zA-Z0-9]", "", agent))
+
+
+assets = AssetIndex(VALORANT_ASSETS_PATH)
+agent_emojis = EmojiIndex()
@@ -1,26 +1,50 @@
 """classes for valorant watch"""
 
+import json
 import os
 import random
-import re
-from typing import Dict, List, Literal, Optional, Tuple, Union
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 
-import aiohttp
-from disnake import Embed
+from disnake import Embed, Emoji
 from disnake.ext.commands import Bot
 
-from helpers.db import GuildData, PlayerData, WaitlistData, db
+from helpers.cache import TTLCache
+from helpers.db import (
+    GuildData,
+    MatchData,
+    PlayerData,
+    PlayerMatchData,
+    db,
+)
 from helpers.helpers import DiscordReturn
+from helpers.http_client import http_client
+from helpers.ratelimit import TokenBucket
+from helpers.ring_buffer import RingBuffer
+from helpers.scheduler import watch_scheduler
+from helpers.valorant_assets import agent_emojis, assets
+from helpers.valorant_parser import parse_match
 
 API = "https://api.henrikdev.xyz/valorant"
 HEADERS = {"Authorization": os.environ.get("VALORANT_TOKEN")}
+VALORANT_RATE_LIMIT: float = float(os.environ.get("VALORANT_RATE_LIMIT", 30))
+STATS_WINDOW: int = int(os.environ.get("STATS_WINDOW", 5))
+
+# shared by every request to the henrikdev api
+limiter: TokenBucket = TokenBucket.per_minute(VALORANT_RATE_LIMIT)
 
 
 class Stats:
     """stats for valorant player
 
+    per game stats are kept for the last `window` games in ring buffers with
+    running sums, so recording a game and averaging are O(1) whatever the
+    window size
+
     attributes
     ----------
+    window: int
+        number of games per game stats are kept for
     streak: int
         current streak
     headshots: List[Optional[int]]
@@ -45,18 +69,35 @@ class Stats:
         saved in database (only `acs` is saved in database)
     """
 
-    def __init__(self) -> None:
-        """initialises all stats to 0 or empty list"""
+    __slots__ = (
+        "window",
+        "streak",
+        "_headshots",
+        "_bodyshots",
+        "_legshots",
+        "_acs",
+        "kills",
+        "deaths",
+        "assists",
+        "prev_acs",
+    )
+
+    def __init__(self, window: int = STATS_WINDOW) -> None:
+        """initialises all stats to 0 or empty
+
+        parameters
+        ----------
+        window: int
+            number of games per game stats are kept for
+        """
+        self.window: int = window
+        """number of games per game stats are kept for"""
         self.streak: int = 0
         """current streak"""
-        self.headshots: List[Optional[int]] = []
-        """number of headshots for each game or None if no headshots"""
-        self.bodyshots: List[Optional[int]] = []
-        """number of bodyshots for each game or None if no bodyshots"""
-        self.legshots: List[Optional[int]] = []
-        """number of legshots for each game or None if no legshots"""
-        self.acs: List[Optional[float]] = []
-        """acs for each game or None if no acs"""
+        self._headshots: RingBuffer = RingBuffer(window, typecode="q")
+        self._bodyshots: RingBuffer = RingBuffer(window, typecode="q")
+        self._legshots: RingBuffer = RingBuffer(window, typecode="q")
+        self._acs: RingBuffer = RingBuffer(window, typecode="d")
         self.kills: int = 0
         """kills in last game. used to check if player is feeding and is not
         saved in database"""
@@ -70,23 +111,45 @@ class Stats:
         """acs in last game. used to check if player is feeding and is not
         saved in database (only `acs` is saved in database)"""
 
-    @staticmethod
-    def sum_remove_none(
-        _list: Union[List[Optional[int]], List[Optional[float]]]
-    ) -> Union[int, float]:
-        """returns sum of a list, removing None values
+    @property
+    def headshots(self) -> List[Optional[int]]:
+        """number of headshots for each game or None if no headshots"""
+        return self._headshots.to_list()
 
-        parameters
-        ----------
-        _list: List[Union[int, float, None]]
-            list to sum that may contain None values
+    @headshots.setter
+    def headshots(self, headshots: Optional[List[Optional[int]]]) -> None:
+        self._headshots.clear()
+        self._headshots.extend(headshots or [])
 
-        returns
-        -------
-        Union[int, float]
-            sum of the list after removing None values
-        """
-        return sum(filter(None, _list))
+    @property
+    def bodyshots(self) -> List[Optional[int]]:
+        """number of bodyshots for each game or None if no bodyshots"""
+        return self._bodyshots.to_list()
+
+    @bodyshots.setter
+    def bodyshots(self, bodyshots: Optional[List[Optional[int]]]) -> None:
+        self._bodyshots.clear()
+        self._bodyshots.extend(bodyshots or [])
+
+    @property
+    def legshots(self) -> List[Optional[int]]:
+        """number of legshots for each game or None if no legshots"""
+        return self._legshots.to_list()
+
+    @legshots.setter
+    def legshots(self, legshots: Optional[List[Optional[int]]]) -> None:
+        self._legshots.clear()
+        self._legshots.extend(legshots or [])
+
+    @property
+    def acs(self) -> List[Optional[float]]:
+        """acs for each game or None if no acs"""
+        return self._acs.to_list()
+
+    @acs.setter
+    def acs(self, acs: Optional[List[Optional[float]]]) -> None:
+        self._acs.clear()
+        self._acs.extend(acs or [])
 
     @staticmethod
     def is_feeding(deaths: int, kills: int) -> bool:
@@ -136,7 +199,7 @@ class Stats:
         int
             number of games saved
         """
-        return len(self.headshots)
+        return len(self._headshots)
 
     def avg_headshots(self) -> float:
         """average fraction of total shots that are headshots
@@ -146,11 +209,14 @@ class Stats:
         float
             average headshot percentage
         """
-        if self.num_games() == 0:
-            return 0
-        return self.sum_remove_none(self.headshots) / self.sum_remove_none(
-            self.headshots + self.bodyshots + self.legshots
+        shots: int = (
+            self._headshots.total
+            + self._bodyshots.total
+            + self._legshots.total
         )
+        if self.num_games() == 0 or shots == 0:
+            return 0
+        return self._headshots.total / shots
 
     def avg_acs(self) -> float:
         """average acs of all saved games
@@ -162,7 +228,135 @@ class Stats:
         """
         if self.num_games() == 0:
             return 0
-        return self.sum_remove_none(self.acs) / self.num_games()
+        return self._acs.total / self.num_games()
+
+
+class MatchPlayer:
+    """stats of a player in a valorant match
+
+    attributes
+    ----------
+    puuid: str
+        valorant puuid of the player
+    name: str
+        valorant username of the player
+    tag: str
+        valorant tag of the player
+    team: Literal["red", "blue"]
+        team the player was on
+    character: str
+        name of the agent played
+    tier: str
+        rank of the player at the time of the match e.g. "Gold 1", empty
+        string if unknown
+    has_stats: bool
+        True if the match data had stats for the player, False otherwise
+    kills: int
+        kills in the match
+    deaths: int
+        deaths in the match
+    assists: int
+        assists in the match
+    score: int
+        combat score in the match
+    headshots: Optional[int]
+        headshots in the match
+    bodyshots: Optional[int]
+        bodyshots in the match
+    legshots: Optional[int]
+        legshots in the match
+    """
+
+    __slots__ = (
+        "puuid",
+        "name",
+        "tag",
+        "team",
+        "character",
+        "tier",
+        "has_stats",
+        "kills",
+        "deaths",
+        "assists",
+        "score",
+        "headshots",
+        "bodyshots",
+        "legshots",
+    )
+
+    def __init__(
+        self, player_data: Dict, team: Literal["red", "blue"]
+    ) -> None:
+        """initialises match player with player data
+
+        parameters
+        ----------
+        player_data: Dict
+            player data from match data, see
+            `helpers.valorant_parser.parse_player`
+        team: Literal["red", "blue"]
+            team the player was on
+        """
+        stats: Optional[Dict] = player_data.get("stats")
+        self.puuid: str = player_data.get("puuid", "")
+        """valorant puuid of the player"""
+        self.name: str = player_data.get("name", "")
+        """valorant username of the player"""
+        self.tag: str = player_data.get("tag", "")
+        """valorant tag of the player"""
+        self.team: Literal["red", "blue"] = team
+        """team the player was on"""
+        self.character: str = player_data.get("character", "")
+        """name of the agent played"""
+        self.tier: str = player_data.get("currenttier_patched", "")
+        """rank of the player at the time of the match"""
+        self.has_stats: bool = stats is not None
+        """True if the match data had stats for the player, False otherwise"""
+        stats = stats or {}
+        self.kills: int = stats.get("kills", 0)
+        """kills in the match"""
+        self.deaths: int = stats.get("deaths", 0)
+        """deaths in the match"""
+        self.assists: int = stats.get("assists", 0)
+        """assists in the match"""
+        self.score: int = stats.get("score", 0)
+        """combat score in the match"""
+        self.headshots: Optional[int] = stats.get("headshots")
+        """headshots in the match"""
+        self.bodyshots: Optional[int] = stats.get("bodyshots")
+        """bodyshots in the match"""
+        self.legshots: Optional[int] = stats.get("legshots")
+        """legshots in the match"""
+
+    def __repr__(self) -> str:
+        return f"{self.name}#{self.tag}"
+
+    def to_data(self) -> Dict:
+        """returns the player data the match player can be rebuilt from
+
+        returns
+        -------
+        Dict
+            player data in the same format as match data from the api
+        """
+        player_data: Dict = {
+            "puuid": self.puuid,
+            "name": self.name,
+            "tag": self.tag,
+            "character": self.character,
+            "currenttier_patched": self.tier,
+        }
+        if self.has_stats:
+            player_data["stats"] = {
+                "kills": self.kills,
+                "deaths": self.deaths,
+                "assists": self.assists,
+                "score": self.score,
+                "headshots": self.headshots,
+                "bodyshots": self.bodyshots,
+                "legshots": self.legshots,
+            }
+        return player_data
 
 
 class Match:
@@ -170,14 +364,18 @@ class Match:
 
     attributes
     ----------
+    match_id: str
+        id of the match
     mode: str
         the gamemode of the match
     map: str
         name of the map played
     game_end: int
         unix timestamp of when the match ended
-    players: Dict[Literal["red", "blue"], List[Dict]]
-        list of raw player info in the match, separated by team
+    players: Dict[Literal["red", "blue"], List[MatchPlayer]]
+        list of player info and stats in the match, separated by team
+    players_by_puuid: Dict[str, MatchPlayer]
+        player info and stats in the match by puuid
     rounds_played: int
         number of rounds played in the match (excluding surrendered rounds)
     score: Dict[Literal["red", "blue"], int]
@@ -196,11 +394,25 @@ class Match:
         creates a page view with an alert embed and a stats embed
     """
 
+    __slots__ = (
+        "match_id",
+        "mode",
+        "map",
+        "game_end",
+        "players",
+        "players_by_puuid",
+        "rounds_played",
+        "score",
+        "surrender",
+    )
+
     def __init__(self, match_data: Dict) -> None:
         """initialises match with match data
 
         from match data, updates metadata (gamemode, map, game_end) and
-        players (players, rounds_played, score, surrender)
+        players (players, rounds_played, score, surrender). only the fields
+        kept by `helpers.valorant_parser.parse_match` are used, so the rest
+        of the match data is not kept alive by the match
 
         parameters
         ----------
@@ -212,41 +424,80 @@ class Match:
         ValueError
             if match data is None or metadata or players is None
         """
+        match_data = parse_match(match_data)
         if match_data is None:
             raise ValueError("match data is None!")
         metadata: Optional[Dict] = match_data.get("metadata")
         players: Optional[Dict[str, Dict]] = match_data.get("players")
         if metadata is None or players is None:
             raise ValueError("match data is None!")
+        self.match_id: str = ""
+        """id of the match"""
         self.mode: str = ""
         """the gamemode of the match"""
         self.map: str = ""
         """name of the map played"""
         self.game_end: int = 0
         """unix timestamp of when the match ended"""
-        self.players: Dict[Literal["red", "blue"], List[Dict]] = {
+        self.players: Dict[Literal["red", "blue"], List[MatchPlayer]] = {
             "red": [],
             "blue": [],
         }
-        """list of raw player info in the match, separated by team"""
+        """list of player info and stats in the match, separated by team"""
+        self.players_by_puuid: Dict[str, MatchPlayer] = {}
+        """player info and stats in the match by puuid"""
         self.rounds_played: int = 0
         """number of rounds played in the match (excluding surrendered)"""
         self.score: Dict[Literal["red", "blue"], int] = {"red": 0, "blue": 0}
         """score for each team"""
         self.surrender: bool = False
         """True if match was surrendered, False otherwise"""
-        self._map_thumbnail: str = ""
 
         self.update_metadata(metadata)
         if self.mode in ["Deathmatch", "Team Deathmatch"]:
             return
-        self.players["red"] = players.get("red", [])
-        self.players["blue"] = players.get("blue", [])
+        self.update_players(players)
+        summary: Optional[Dict] = match_data.get("summary")
+        if summary is not None:
+            # saved by `to_data`, the rounds are already summarised
+            self.rounds_played = summary.get("rounds_played", 0)
+            self.score.update(summary.get("score", {}))
+            self.surrender = summary.get("surrender", False)
+            return
         rounds: Optional[List[Dict]] = match_data.get("rounds")
         if rounds is None:
             return
         self.update_rounds(rounds)
 
+    def to_data(self) -> Dict:
+        """returns the match data the match can be rebuilt from with
+        `Match(match_data)`, with the rounds summarised
+
+        returns
+        -------
+        Dict
+            match data in the same format as match data from the api
+        """
+        return {
+            "metadata": {
+                "matchid": self.match_id,
+                "mode": self.mode,
+                "map": self.map,
+                # only the end of the match is kept
+                "game_start": self.game_end,
+                "game_length": 0,
+            },
+            "players": {
+                team: [player.to_data() for player in players]
+                for team, players in self.players.items()
+            },
+            "summary": {
+                "rounds_played": self.rounds_played,
+                "score": self.score,
+                "surrender": self.surrender,
+            },
+        }
+
     @property
     def red_win(self) -> Literal[1, -1, 0]:
         """checks if red won, blue won, or draw from score
@@ -264,36 +515,18 @@ class Match:
 
     @property
     async def map_thumbnail(self) -> str:
-        """attempts to retrieve map thumbnail url from api by map name
+        """retrieves map thumbnail url from the asset index by map name
 
-        uses the `valorant-api` api to retrieve map info and checks if the
-        map name matches the map name of the match. if it does, returns the
-        map thumbnail url. otherwise, returns an empty string
+        the asset index is loaded first if it has not been loaded yet
 
         returns
         -------
         str
             map thumbnail url if map name matches, empty string otherwise
         """
-        if self._map_thumbnail != "":
-            return self._map_thumbnail
-        async with aiohttp.ClientSession() as session:
-            map_request: aiohttp.ClientResponse = await session.get(
-                "https://valorant-api.com/v1/maps"
-            )
-            if map_request.status != 200:
-                # raise ConnectionError("error retrieving map info!")
-                return ""
-            map_json: Dict[str, List] = await map_request.json()
-        map_data: Optional[List[Dict]] = map_json.get("data")
-        if map_data is None:
-            # raise ConnectionError("error retrieving map info!")
-            return ""
-        for map_info in map_data:
-            if map_info.get("displayName") == self.map:
-                self._map_thumbnail = map_info.get("splash", "")
-                return self._map_thumbnail
-        return ""
+        if not assets.maps:
+            await assets.load()
+        return assets.map_splash(self.map)
 
     @property
     async def alert_embed(self) -> Embed:
@@ -315,7 +548,8 @@ class Match:
         ----------
         bot: Bot
             bot instance
-            bot instance is used to retrieve emojis
+            bot instance is used to build the agent emoji index if it has not
+            been built yet
 
         returns
         -------
@@ -327,39 +561,26 @@ class Match:
             description=f"🔴 **{self.score['red']} - {self.score['blue']}** 🔵",
             color=0x3737E1,
         ).set_thumbnail(await self.map_thumbnail)
-        all_players_sorted: List[Dict] = sorted(
+        if not agent_emojis.built:
+            agent_emojis.build(bot.emojis)
+        all_players_sorted: List[MatchPlayer] = sorted(
             self.players["red"] + self.players["blue"],
-            key=lambda player: player.get("stats", {}).get("score", 0),
+            key=lambda player: player.score,
             reverse=True,
         )
         for player in all_players_sorted:
-            team: Literal["🔴", "🔵"] = (
-                "🔴" if player.get("team") == "Red" else "🔵"
-            )
-            stats: Dict = player.get("stats", {})
-            kda: str = "/".join(
-                [
-                    str(stats.get("kills", 0)),
-                    str(stats.get("deaths", 0)),
-                    str(stats.get("assists", 0)),
-                ]
+            team: Literal["🔴", "🔵"] = "🔴" if player.team == "red" else "🔵"
+            kda: str = f"{player.kills}/{player.deaths}/{player.assists}"
+            acs: float = player.score / self.rounds_played
+            emoji: Union[Emoji, str] = agent_emojis.get(player.character) or ""
+            rank: str = (
+                f"  |  {player.tier or 'Unranked'}"
+                if self.mode == "Competitive"
+                else ""
             )
-            acs: float = stats.get("score", 0) / self.rounds_played
-            emojis: list = [
-                emoji
-                for emoji in bot.emojis
-                if emoji.name
-                == re.sub(r"[^a-zA-Z0-9]", "", player.get("character", ""))
-            ]
-            emoji: str = emojis[0] if len(emojis) > 0 else ""
             stats_embed.add_field(
-                name=f"{team} {player.get('name')}#{player.get('tag')}",
-                value=f"{emoji} {kda}  |  {int(acs)} ACS"
-                + (
-                    f"  |  {player.get('currenttier_patched', 'Unranked')}"
-                    if self.mode == "Competitive"
-                    else ""
-                ),
+                name=f"{team} {player.name}#{player.tag}",
+                value=f"{emoji} {kda}  |  {int(acs)} ACS{rank}",
                 inline=False,
             )
         return stats_embed
@@ -375,19 +596,37 @@ class Match:
         return self.mode in ("Competitive", "Unrated", "Custom Game")
 
     def update_metadata(self, metadata: Dict) -> None:
-        """updates mode, map, and game_end from match data metadata
+        """updates match_id, mode, map, and game_end from match data metadata
 
         parameters
         ----------
         metadata: Dict
             match data metadata
         """
+        self.match_id = metadata.get("matchid", "")
         self.mode = metadata.get("mode", "")
         self.map = metadata.get("map", "")
         start: int = metadata.get("game_start", 0)
         length: int = metadata.get("game_length", 0)
         self.game_end = start + length
 
+    def update_players(self, players: Dict[str, List[Dict]]) -> None:
+        """updates players and players_by_puuid from match data players
+
+        parameters
+        ----------
+        players: Dict[str, List[Dict]]
+            match data players, separated by team
+        """
+        team: Literal["red", "blue"]
+        for team in ("red", "blue"):
+            self.players[team] = [
+                MatchPlayer(player_data, team)
+                for player_data in players.get(team, [])
+            ]
+            for player in self.players[team]:
+                self.players_by_puuid[player.puuid] = player
+
     def update_rounds(self, rounds: List[Dict]) -> None:
         """updates rounds_played, score, and surrender from match data rounds
 
@@ -404,12 +643,8 @@ class Match:
             self.score["red"] += _round.get("winning_team") == "Red"
             self.score["blue"] += _round.get("winning_team") == "Blue"
 
-    def get_player_data(
-        self, player: "Player"
-    ) -> Optional[Tuple[Dict, Literal["red", "blue"]]]:
-        """retreives player info from match data and the team they were on
-
-        attempts to match the player's puuid with the match player's puuid
+    def get_player_data(self, player: "Player") -> Optional[MatchPlayer]:
+        """retreives player info and stats from the match by puuid
 
         parameters
         ----------
@@ -418,17 +653,14 @@ class Match:
 
         returns
         -------
-        Optional[Tuple[Dict, Literal["red", "blue"]]]
-            tuple of player info and team they were on if found, None otherwise
+        Optional[MatchPlayer]
+            player info and stats including the team they were on if found,
+            None otherwise
         """
-        for team in ("red", "blue"):
-            for match_player in self.players[team]:
-                if match_player.get("puuid") == player.puuid:
-                    return match_player, team
-        return None
+        return self.players_by_puuid.get(player.puuid)
 
     def check_players(
-        self, main_player: "Player", all_players: List["Player"]
+        self, main_player: "Player", guild_players: Dict[str, "Player"]
     ) -> Tuple[List["Player"], List["Player"]]:
         """checks and returns players in the match who are in the same guild
         as the main player
@@ -437,8 +669,9 @@ class Match:
         ----------
         main_player: Player
             player to check against
-        all_players: List[Player]
-            list of all players to check
+        guild_players: Dict[str, Player]
+            players in the main player's guild by puuid, see
+            `Roster.guild_players`
 
         returns
         -------
@@ -447,20 +680,15 @@ class Match:
             player
         """
         main_guild_id: int = main_player.guild_id
-        all_puuids_with_guild: Dict[str, "Player"] = {
-            player.puuid: player for player in all_players
-        }
         red_players: List["Player"] = []
         blue_players: List["Player"] = []
         for match_player in self.players["red"]:
-            puuid: str = match_player.get("puuid", "")
-            player: Optional[Player] = all_puuids_with_guild.get(puuid)
+            player: Optional[Player] = guild_players.get(match_player.puuid)
             if player is None or player.guild_id != main_guild_id:
                 continue
             red_players.append(player)
         for match_player in self.players["blue"]:
-            puuid: str = match_player.get("puuid", "")
-            player: Optional[Player] = all_puuids_with_guild.get(puuid)
+            player = guild_players.get(match_player.puuid)
             if player is None or player.guild_id != main_guild_id:
                 continue
             blue_players.append(player)
@@ -618,20 +846,21 @@ class Match:
         return f"removing <@{'> and <@'.join(_waiters)}> from waitlist!"
 
     async def trigger_alert(
-        self, main_player: "Player", all_players: List["Player"]
+        self, main_player: "Player", guild_players: Dict[str, "Player"]
     ) -> Optional[DiscordReturn]:
         """trigger the valorant watch alert and
         return an embed with content if any
 
-        updates all players' stats and checks for feeders and streakers
-        and removes waiters from waitlist
+        updates all players' stats, saves their stats in the match, checks
+        for feeders and streakers and removes waiters from waitlist
 
         parameters
         ----------
         main_player: Player
             player to check against
-        all_players: List[Player]
-            list of all players to check
+        guild_players: Dict[str, Player]
+            players in the main player's guild by puuid, see
+            `Roster.guild_players`
 
         returns
         -------
@@ -642,23 +871,34 @@ class Match:
         red_players: List["Player"]
         blue_players: List["Player"]
         red_players, blue_players = self.check_players(
-            main_player, all_players
+            main_player, guild_players
         )
         if len(red_players) == 0 and len(blue_players) == 0:
             return
         feeders: list["Player"] = []
         streakers: list["Player"] = []
-        waiters: list[int] = []
+        player_matches: List[PlayerMatchData] = []
+        for player in red_players + blue_players:
+            player_matches += player.process_matches([self])
+        # the match is saved so its alert can be re-rendered later
+        saved_match: Optional[MatchData] = None
+        if self.match_id and self.check_mode():
+            saved_match = MatchData(
+                match_id=self.match_id,
+                game_end=self.game_end,
+                data=self.to_data(),
+            )
+        # save all players and pop their waiters in one transaction
+        waiters: list[int] = await db.update_players_pop_waitlist(
+            [player.to_data() for player in red_players + blue_players],
+            player_matches,
+            saved_match,
+        )
+        watch_scheduler.unwait(
+            player.player_id for player in red_players + blue_players
+        )
         for player in red_players + blue_players:
-            player.process_match(self)
-            await player.update_db()
-            waitlist_data: List[WaitlistData]
-            waitlist_data = await db.get_waitlist_data(player.player_id)
-            if len(waitlist_data) > 0:
-                _waiters: Optional[List[int]] = waitlist_data[0]["waiting_id"]
-                if _waiters is not None:
-                    waiters += _waiters
-                await db.delete_waitlist_data(player.player_id)
+            roster.add(player)
             if not self.check_mode():
                 continue
             if player.check_feeding():
@@ -676,6 +916,69 @@ class Match:
         }
 
 
+# matches are shared by every watched player who played in them
+match_cache: TTLCache[str, Match] = TTLCache(ttl=60 * 5)
+
+
+def get_match(match_data: Dict) -> Match:
+    """returns the match for the match data, reusing the cached match if it
+    was already parsed for another player
+
+    parameters
+    ----------
+    match_data: Dict
+        match data from api
+
+    returns
+    -------
+    Match
+        match built from the match data
+
+    raises
+    ------
+    ValueError
+        if match data is None or metadata or players is None
+    """
+    metadata: Dict = (match_data or {}).get("metadata") or {}
+    match_id: Optional[str] = metadata.get("matchid")
+    if match_id:
+        cached: Optional[Match] = match_cache.get(match_id)
+        if cached is not None:
+            return cached
+    match: Match = Match(match_data)
+    if match.match_id:
+        match_cache.set(match.match_id, match)
+    return match
+
+
+async def get_saved_match(match_id: str) -> Optional[Match]:
+    """returns the match from the cache, or rebuilt from the database if it
+    was saved when alerted
+
+    parameters
+    ----------
+    match_id: str
+        id of the match
+
+    returns
+    -------
+    Optional[Match]
+        the match if cached or saved, None otherwise
+    """
+    cached: Optional[Match] = match_cache.get(match_id)
+    if cached is not None:
+        return cached
+    saved: Optional[MatchData] = await db.get_match(match_id)
+    if saved is None:
+        return None
+    try:
+        match: Match = Match(saved["data"])
+    except ValueError:
+        return None
+    match_cache.set(match_id, match)
+    return match
+
+
 class Player(Stats):
     """valorant player with stats and account info
 
@@ -755,14 +1058,11 @@ class Player(Stats):
         ConnectionError
             if error retrieving account info
         """
-        async with aiohttp.ClientSession() as session:
-            account_request: aiohttp.ClientResponse = await session.get(
-                f"{API}/v1/account/{self.name}/{self.tag}",
-                headers=HEADERS,
-            )
-            if account_request.status != 200:
-                raise ConnectionError("error retrieving account info!")
-            account_json: Dict[str, Dict] = await account_request.json()
+        await limiter.acquire()
+        account_json: Dict[str, Dict] = await http_client.get_json(
+            f"{API}/v1/account/{self.name}/{self.tag}",
+            headers=HEADERS,
+        )
         account_data: Optional[Dict] = account_json.get("data")
         if account_data is None:
             raise ConnectionError("error retrieving account info!")
@@ -775,15 +1075,15 @@ class Player(Stats):
 
         non-critical and if error, name and tag are not updated
         """
-        async with aiohttp.ClientSession() as session:
-            account_request: aiohttp.ClientResponse = await session.get(
+        await limiter.acquire()
+        try:
+            account_json: Dict[str, Dict] = await http_client.get_json(
                 f"{API}/v1/by-puuid/account/{self.puuid}",
                 headers=HEADERS,
             )
-            if account_request.status != 200:
-                # raise ConnectionError("error retrieving account info!")
-                return
-            account_json: Dict[str, Dict] = await account_request.json()
+        except ConnectionError:
+            # error retrieving account info
+            return
         account_data: Optional[Dict] = account_json.get("data")
         if account_data is None:
             # raise ConnectionError("error retrieving account info!")
@@ -799,6 +1099,48 @@ class Player(Stats):
         self.region = region or self.region
         self.card = account_data.get("card", {}).get("id") or self.card
 
+    async def has_new_match(self) -> bool:
+        """cheaply checks if the player may have played a match since
+        lasttime, before fetching the full match history
+
+        only the metadata of the newest stored match is requested. a match
+        that started before lasttime has already been processed, as lasttime
+        is the end of the newest processed match
+
+        returns
+        -------
+        bool
+            False if the newest match has already been processed, True if it
+            has not or if it could not be checked
+        """
+        if not self.lasttime:
+            return True
+        await limiter.acquire()
+        try:
+            stored_json: Dict[str, List] = await http_client.get_json(
+                f"{API}/v1/by-puuid/stored-matches/{self.region}/{self.puuid}",
+                headers=HEADERS,
+                params={"size": 1},
+            )
+        except ConnectionError:
+            # e.g. no stored matches yet, fall back to the match history
+            return True
+        stored_data: Optional[List[Dict]] = stored_json.get("data")
+        if not stored_data:
+            return True
+        started_at: Optional[str] = (
+            stored_data[0].get("meta", {}).get("started_at")
+        )
+        if not started_at:
+            return True
+        try:
+            start: float = datetime.fromisoformat(
+                started_at.replace("Z", "+00:00")
+            ).timestamp()
+        except ValueError:
+            return True
+        return start >= self.lasttime
+
     async def get_match_history(self) -> List[Match]:
         """retrieve match history from api
 
@@ -812,26 +1154,23 @@ class Player(Stats):
         ConnectionError
             if error retrieving match history
         """
-        async with aiohttp.ClientSession() as session:
-            match_request: aiohttp.ClientResponse = await session.get(
-                f"{API}/v3/by-puuid/matches/{self.region}/{self.puuid}",
-                headers=HEADERS,
-            )
-            if match_request.status != 200:
-                raise ConnectionError("error retrieving match history!")
-            match_json: Dict[str, List] = await match_request.json()
+        await limiter.acquire()
+        match_json: Dict[str, List] = await http_client.get_json(
+            f"{API}/v3/by-puuid/matches/{self.region}/{self.puuid}",
+            headers=HEADERS,
+        )
         match_data: Optional[List[Dict]] = match_json.get("data")
         if match_data is None:
             raise ConnectionError("error retrieving match history!")
         matches: List[Match] = []
         for match in match_data:
             try:
-                matches.append(Match(match))
+                matches.append(get_match(match))
             except ValueError:
                 continue
         return matches[::-1]
 
-    def process_match(self, match: Match) -> None:
+    def process_match(self, match: Match) -> Optional[PlayerMatchData]:
         """process match information and updates player stats and information
 
         skips match if match is not Unrated/Competitive/Custom Game, or if
@@ -844,6 +1183,12 @@ class Player(Stats):
         ----------
         match: Match
             match to process
+
+        returns
+        -------
+        Optional[PlayerMatchData]
+            stats of the player in the match to save in the database if
+            stats were updated, None otherwise
         """
         # only add stats for competitive/unrated/custom games
         if self.lasttime >= match.game_end:
@@ -851,35 +1196,46 @@ class Player(Stats):
         self.lasttime = match.game_end
         if not match.check_mode():
             return
-        check: Optional[Tuple[Dict, Literal["red", "blue"]]] = (
-            match.get_player_data(self)
-        )
-        if check is None:
+        player: Optional[MatchPlayer] = match.get_player_data(self)
+        if player is None or not player.has_stats:
             return
-        player: Dict
-        team: Literal["red", "blue"]
-        player, team = check
-        player_stats: Optional[Dict] = player.get("stats")
-        if player_stats is None:
-            return
-        self.kills = player_stats.get("kills")
-        self.deaths = player_stats.get("deaths")
-        self.assists = player_stats.get("assists")
-        self.prev_acs = player_stats.get("score") / match.rounds_played
+        self.kills = player.kills
+        self.deaths = player.deaths
+        self.assists = player.assists
+        self.prev_acs = player.score / match.rounds_played
         # update streak
-        if match.red_win == 0:
-            pass
-        elif (team == "red") ^ (match.red_win == 1):
+        result: Literal[1, -1, 0] = (
+            match.red_win if player.team == "red" else -match.red_win
+        )
+        if result == -1:
             self.streak = min(self.streak - 1, -1)
-        else:
+        elif result == 1:
             self.streak = max(self.streak + 1, 1)
         if match.mode == "Competitive":
-            self.rank = player.get("currenttier_patched", self.rank)
+            self.rank = player.tier or self.rank
         self.update_stats(
-            self.prev_acs,
-            player_stats.get("headshots"),
-            player_stats.get("bodyshots"),
-            player_stats.get("legshots"),
+            self.prev_acs, player.headshots, player.bodyshots, player.legshots
+        )
+        if not match.match_id:
+            return None
+        return PlayerMatchData(
+            puuid=self.puuid,
+            match_id=match.match_id,
+            guild_id=self.guild_id,
+            game_end=match.game_end,
+            mode=match.mode,
+            map=match.map,
+            agent=player.character,
+            kills=player.kills,
+            deaths=player.deaths,
+            assists=player.assists,
+            score=player.score,
+            acs=self.prev_acs,
+            headshots=player.headshots,
+            bodyshots=player.bodyshots,
+            legshots=player.legshots,
+            result=result,
+            rank=player.tier or None,
         )
 
     def update_stats(
@@ -887,7 +1243,7 @@ class Player(Stats):
     ) -> None:
         """updates player stats with new stats
 
-        each stat is limited to the last 5 games
+        each stat is limited to the last `window` games
 
         parameters
         ----------
@@ -900,34 +1256,87 @@ class Player(Stats):
         legshots: int
             number of legshots in the game
         """
-        self.acs = self.acs[-4:] + [acs]
-        self.headshots = self.headshots[-4:] + [headshots]
-        self.bodyshots = self.bodyshots[-4:] + [bodyshots]
-        self.legshots = self.legshots[-4:] + [legshots]
+        self._acs.append(acs)
+        self._headshots.append(headshots)
+        self._bodyshots.append(bodyshots)
+        self._legshots.append(legshots)
+
+    def process_matches(self, matches: List[Match]) -> List[PlayerMatchData]:
+        """process list of matches and updates player stats and information
 
-    def process_matches(self, matches: List[Match]) -> None:
-        """process list of matches and updates player stats and information"""
+        returns
+        -------
+        List[PlayerMatchData]
+            stats of the player in the matches to save in the database
+        """
+        player_matches: List[PlayerMatchData] = []
         for match in matches:
-            self.process_match(match)
+            player_match: Optional[PlayerMatchData] = self.process_match(match)
+            if player_match is not None:
+                player_matches.append(player_match)
+        return player_matches
 
-    async def update_db(self) -> str:
-        """updates player data in database"""
-        return await db.update_player_data(
-            self.player_id,
+    def to_data(self) -> PlayerData:
+        """returns the player data saved in the database
+
+        returns
+        -------
+        PlayerData
+            player data to save in the database
+        """
+        return PlayerData(
+            player_id=self.player_id,
             guild_id=self.guild_id,
             name=self.name,
             tag=self.tag,
             region=self.region,
             puuid=self.puuid,
-            lasttime=self.lasttime,
+            lastTime=self.lasttime,
             streak=self.streak,
             headshots=self.headshots,
             bodyshots=self.bodyshots,
             legshots=self.legshots,
             acs=self.acs,
             rank=self.rank,
+            # saving a player means their user exists
+            deactivated_at=None,
         )
 
+    async def update_db(self) -> str:
+        """updates player data in database and in the roster
+
+        raises
+        ------
+        asyncpg.UniqueViolationError
+            if the puuid is already watched by another player
+        """
+        data: PlayerData = self.to_data()
+        del data["player_id"]
+        out: str = await db.update_player_data(self.player_id, **data)
+        roster.add(self)
+        return out
+
+    async def load_match_stats(self) -> None:
+        """replaces the per game stats with the player's most recent matches
+        saved in the database, if any
+        """
+        player_matches: List[PlayerMatchData] = await db.get_player_matches(
+            self.puuid, self.window
+        )
+        if len(player_matches) == 0:
+            return
+        player_matches = player_matches[::-1]
+        self.acs = [player_match["acs"] for player_match in player_matches]
+        self.headshots = [
+            player_match["headshots"] for player_match in player_matches
+        ]
+        self.bodyshots = [
+            player_match["bodyshots"] for player_match in player_matches
+        ]
+        self.legshots = [
+            player_match["legshots"] for player_match in player_matches
+        ]
+
     def info_embed(self) -> Embed:
         """returns embed containing player info and stats
 
@@ -988,3 +1397,202 @@ class Player(Stats):
                 text=f"from last {self.num_games()} ranked/unrated games"
             )
         return embed
+
+
+class Roster:
+    """in-memory roster of all watched players
+
+    loaded from the database once, then kept up to date with the changes
+    written by this process and the changes other processes write to the
+    players table, received through postgres notifications. players are also
+    indexed by guild and puuid so the watched players in a match can be
+    found without scanning the roster
+
+    attributes
+    ----------
+    loaded: bool
+        whether the roster has been loaded from the database
+    players: List[Player]
+        all players in the roster
+    """
+
+    def __init__(self) -> None:
+        """initialises an empty roster"""
+        self.loaded: bool = False
+        """whether the roster has been loaded from the database"""
+        self._players: Dict[int, Player] = {}
+        # empty guilds are kept so the dicts returned by `guild_players`
+        # stay up to date while a guild is being checked
+        self._by_guild: Dict[int, Dict[str, Player]] = {}
+        # guild_id and puuid each player is indexed under, which can differ
+        # from the player's current ones until the player is reindexed
+        self._index_keys: Dict[int, Tuple[int, str]] = {}
+
+    @property
+    def players(self) -> List[Player]:
+        """all players in the roster
+
+        returns
+        -------
+        List[Player]
+            all players in the roster
+        """
+        return list(self._players.values())
+
+    async def load(self) -> None:
+        """loads all players from the database and listens for changes made
+        by other processes. does nothing if already loaded
+        """
+        if self.loaded:
+            return
+        await db.listen("players", self._on_players_change)
+        players_data: List[PlayerData] = await db.get_all_players()
+        self._players = {}
+        self._by_guild = {}
+        self._index_keys = {}
+        for data in players_data:
+            self.add(Player(data))
+        self.loaded = True
+
+    def _index(self, player: Player) -> None:
+        """indexes the player under their current guild and puuid, removing
+        them from where they were indexed before
+
+        parameters
+        ----------
+        player: Player
+            player to index
+        """
+        self._unindex(player.player_id)
+        if not player.puuid:
+            return
+        guild_id: int = player.guild_id or 0
+        self._by_guild.setdefault(guild_id, {})[player.puuid] = player
+        self._index_keys[player.player_id] = (guild_id, player.puuid)
+
+    def _unindex(self, player_id: int) -> None:
+        """removes the player with player_id from the guild index
+
+        parameters
+        ----------
+        player_id: int
+            discord id of the player
+        """
+        keys: Optional[Tuple[int, str]] = self._index_keys.pop(player_id, None)
+        if keys is None:
+            return
+        guild_id, puuid = keys
+        guild_players: Optional[Dict[str, Player]] = self._by_guild.get(
+            guild_id
+        )
+        if guild_players is None:
+            return
+        indexed: Optional[Player] = guild_players.get(puuid)
+        if indexed is not None and indexed.player_id == player_id:
+            del guild_players[puuid]
+
+    def guild_players(self, guild_id: int) -> Dict[str, Player]:
+        """returns the players in the guild by puuid
+
+        the dict is the index itself and must not be modified
+
+        parameters
+        ----------
+        guild_id: int
+            discord id of the guild, 0 for players without a guild
+
+        returns
+        -------
+        Dict[str, Player]
+            players in the guild by puuid
+        """
+        return self._by_guild.setdefault(guild_id, {})
+
+    def get(self, player_id: int) -> Optional[Player]:
+        """returns the player with player_id if in the roster
+
+        parameters
+        ----------
+        player_id: int
+            discord id of the player
+
+        returns
+        -------
+        Optional[Player]
+            player if in the roster, None otherwise
+        """
+        return self._players.get(player_id)
+
+    def add(self, player: Player) -> None:
+        """adds the player to the roster, replacing the saved player with the
+        same player_id if any
+
+        parameters
+        ----------
+        player: Player
+            player to add
+        """
+        self._players[player.player_id] = player
+        self._index(player)
+
+    def update(self, player_id: int, **fields: Any) -> None:
+        """updates fields of the player with player_id if in the roster.
+        specify fields to update by using kwargs. e.g. key=value
+
+        parameters
+        ----------
+        player_id: int
+            discord id of the player to update
+        fields: Any
+            fields to update
+        """
+        player: Optional[Player] = self._players.get(player_id)
+        if player is None:
+            return
+        for key, value in fields.items():
+            setattr(player, key, value)
+        self._index(player)
+
+    def remove(self, player_id: int) -> None:
+        """removes the player with player_id from the roster
+
+        parameters
+        ----------
+        player_id: int
+            discord id of the player to remove
+        """
+        self._players.pop(player_id, None)
+        self._unindex(player_id)
+
+    async def _on_players_change(
+        self, _connection: Any, _pid: int, _channel: str, payload: str
+    ) -> None:
+        """applies a change to the players table made by another process
+
+        parameters
+        ----------
+        _connection: Any
+            connection the notification was received on
+        _pid: int
+            backend pid of the notifying session
+        _channel: str
+            channel the notification was sent on
+        payload: str
+            json object with the operation, id and origin
+        """
+        change: Dict[str, Any] = json.loads(payload)
+        if change.get("origin") == db.application_name:
+            # already applied when written
+            return
+        player_id: int = change["id"]
+        if change.get("op") == "DELETE":
+            self.remove(player_id)
+            return
+        player_data: List[PlayerData] = await db.get_player_data(player_id)
+        if len(player_data) == 0 or player_data[0]["deactivated_at"]:
+            self.remove(player_id)
+            return
+        self.add(Player(player_data[0]))
+
+
+roster = Roster()
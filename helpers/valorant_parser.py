@@ -0,0 +1,101 @@
+"""selective parsing of valorant match payloads
+
+match payloads from the api contain every round, kill event and economy
+record of the match. only the fields used by `Match` and
+`Player.process_match` are kept so the rest of the payload can be freed as
+soon as it is decoded
+"""
+from typing import Dict, Iterable, List, Optional
+
+METADATA_KEYS = ("matchid", "mode", "map", "game_start", "game_length")
+PLAYER_KEYS = ("puuid", "name", "tag", "team", "character")
+RANK_KEYS = ("currenttier_patched",)
+STATS_KEYS = (
+    "score",
+    "kills",
+    "deaths",
+    "assists",
+    "headshots",
+    "bodyshots",
+    "legshots",
+)
+ROUND_KEYS = ("winning_team", "end_type")
+# round results already summarised by `Match.to_data`
+SUMMARY_KEYS = ("rounds_played", "score", "surrender")
+
+
+def pick(data: Dict, keys: Iterable[str]) -> Dict:
+    """returns a new dict with only the keys of data that are in keys
+
+    parameters
+    ----------
+    data: Dict
+        dict to pick from
+    keys: Iterable[str]
+        keys to keep
+
+    returns
+    -------
+    Dict
+        dict with only the picked keys
+    """
+    return {key: data[key] for key in keys if key in data}
+
+
+def parse_player(player: Dict) -> Dict:
+    """keeps only the player fields used for alerts and stats
+
+    parameters
+    ----------
+    player: Dict
+        player data from a match payload
+
+    returns
+    -------
+    Dict
+        player info, rank and stats
+    """
+    parsed: Dict = pick(player, PLAYER_KEYS + RANK_KEYS)
+    stats: Optional[Dict] = player.get("stats")
+    if stats is not None:
+        parsed["stats"] = pick(stats, STATS_KEYS)
+    return parsed
+
+
+def parse_match(match_data: Optional[Dict]) -> Optional[Dict]:
+    """keeps only the match fields used for alerts and stats
+
+    metadata or players are left as None if missing from the payload so
+    `Match` can still reject the match. a summary of the rounds saved by
+    `Match.to_data` is kept instead of rounds if present
+
+    parameters
+    ----------
+    match_data: Optional[Dict]
+        match data from the api
+
+    returns
+    -------
+    Optional[Dict]
+        metadata, players of each team and round results, None if
+        match_data is None
+    """
+    if match_data is None:
+        return None
+    parsed: Dict = {"metadata": None, "players": None, "rounds": None}
+    metadata: Optional[Dict] = match_data.get("metadata")
+    if metadata is not None:
+        parsed["metadata"] = pick(metadata, METADATA_KEYS)
+    players: Optional[Dict[str, List[Dict]]] = match_data.get("players")
+    if players is not None:
+        parsed["players"] = {
+            team: [parse_player(player) for player in players.get(team) or []]
+            for team in ("red", "blue")
+        }
+    rounds: Optional[List[Dict]] = match_data.get("rounds")
+    if rounds is not None:
+        parsed["rounds"] = [pick(_round, ROUND_KEYS) for _round in rounds]
+    summary: Optional[Dict] = match_data.get("summary")
+    if summary is not None:
+        parsed["summary"] = pick(summary, SUMMARY_KEYS)
+    return parsed
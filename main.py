@@ -11,6 +11,7 @@ from dotenv import load_dotenv
 
 from cogs.custom_help import help as custom_help
 from helpers.db import GuildData, db
+from helpers.http_client import http_client
 
 dotenv_path: str = join(dirname(__file__), ".env")
 load_dotenv(dotenv_path)
@@ -28,6 +29,17 @@ if not DATABASE_URL:
 DEFAULT_PREFIX: str = os.environ.get("DEFAULT_PREFIX", "?")
 SLASH_ENABLED: str = os.environ.get("SLASH_ENABLED", "1")
 PREFIX_ENABLED: str = os.environ.get("PREFIX_ENABLED", "1")
+# number of gateway shards, recommended by discord if not set
+SHARD_COUNT: Optional[int] = None
+if os.environ.get("SHARD_COUNT"):
+    SHARD_COUNT = int(os.environ["SHARD_COUNT"])
+# shards this replica connects to, all shards if not set
+SHARD_IDS: Optional[List[int]] = None
+if os.environ.get("SHARD_IDS"):
+    SHARD_IDS = [int(i) for i in os.environ["SHARD_IDS"].split(",")]
+    if SHARD_COUNT is None:
+        print("SHARD_COUNT missing, required with SHARD_IDS")
+        sys.exit(1)
 DEBUG_MODE = False
 
 
@@ -44,13 +56,28 @@ async def get_prefix(_bot, message) -> List[str]:
     return commands.when_mentioned_or(custom_prefix)(_bot, message)
 
 
+class LaffeyBot(commands.AutoShardedBot):
+    """bot which releases shared resources when shutting down
+
+    connects to the gateway with several shards, all of them unless
+    `SHARD_IDS` is set
+    """
+
+    async def close(self) -> None:
+        """closes the shared http client before closing the bot"""
+        await http_client.close()
+        await super().close()
+
+
 intents: Intents = Intents.default()
 intents.message_content = True
 
-bot = commands.Bot(
+bot = LaffeyBot(
     command_prefix=get_prefix,
     intents=intents,
     help_command=custom_help.Help(),
+    shard_count=SHARD_COUNT,
+    shard_ids=SHARD_IDS,
 )
 
 
@@ -1,6 +1,6 @@
 """disnake views"""
 from dataclasses import dataclass
-from typing import List, Union, Optional
+from typing import Awaitable, Callable, List, Union, Optional
 
 from disnake import (
     ApplicationCommandInteraction,
@@ -21,10 +21,14 @@ from helpers.db import db
 class SelectEmbed:
     """stores information about an embed for the select menu
 
+    the embed can be given directly, or rendered by an async factory the
+    first time the page is shown and then reused, so pages that are never
+    shown cost nothing
+
     parameters
     ----------
-    embed: Embed
-        embed to show
+    embed: Optional[Embed]
+        embed to show, None until rendered if factory is given
     name: Optional[str]
         display name in dropdown
     color: Optional[int]
@@ -33,10 +37,12 @@ class SelectEmbed:
         display description in dropdown
     emoji: Optional[str]
         display emoji in dropdown
+    factory: Optional[Callable[[], Awaitable[Embed]]]
+        renders the embed the first time the page is shown
     """
 
-    embed: Embed
-    """embed to show"""
+    embed: Optional[Embed] = None
+    """embed to show, None until rendered if factory is given"""
     name: str = ""
     """display name in dropdown"""
     color: int = 0
@@ -45,6 +51,40 @@ class SelectEmbed:
     """display description in dropdown"""
     emoji: str = ""
     """display emoji in dropdown"""
+    factory: Optional[Callable[[], Awaitable[Embed]]] = None
+    """renders the embed the first time the page is shown"""
+
+    @property
+    def rendered(self) -> bool:
+        """whether the embed is ready to be shown without rendering
+
+        returns
+        -------
+        bool
+            True if the embed was given or already rendered
+        """
+        return self.embed is not None
+
+    async def render(self) -> Embed:
+        """returns the embed, rendering it with the factory if it has not
+        been rendered yet
+
+        returns
+        -------
+        Embed
+            embed of the page
+
+        raises
+        ------
+        ValueError
+            if neither embed nor factory was given
+        """
+        if self.embed is None:
+            if self.factory is None:
+                raise ValueError("page has no embed!")
+            self.embed = await self.factory()
+            self.factory = None
+        return self.embed
 
 
 class Menu(View):
@@ -411,15 +451,22 @@ class PageSelect(Select):
         if self.current_value == self.values[0]:
             return
         self.current_value = self.values[0]
-        embed: Embed = self.embeds_dict[self.values[0]].embed
-        await interaction.response.edit_message(
-            embed=embed,
-            view=PageView(
-                embeds=self.embeds,
-                reply=interaction.message,
-                timeout=self._timeout,
-                reset_to_home=self._reset_to_home,
-            ),
+        page: SelectEmbed = self.embeds_dict[self.values[0]]
+        view: PageView = PageView(
+            embeds=self.embeds,
+            reply=interaction.message,
+            timeout=self._timeout,
+            reset_to_home=self._reset_to_home,
+        )
+        if page.rendered:
+            await interaction.response.edit_message(
+                embed=await page.render(), view=view
+            )
+            return
+        # rendering may take longer than discord waits for a response
+        await interaction.response.defer()
+        await interaction.edit_original_message(
+            embed=await page.render(), view=view
         )
 
 
@@ -467,6 +514,9 @@ class PageView(View):
         self.add_item(PageSelect(embeds, timeout, reset_to_home))
 
     async def on_timeout(self) -> None:
-        await self.reply.edit(view=None)
         if self.reset_to_home:
-            await self.reply.edit(embed=self.embeds[0].embed)
+            await self.reply.edit(
+                embed=await self.embeds[0].render(), view=None
+            )
+        else:
+            await self.reply.edit(view=None)